@@ -1,3 +1,5 @@
+import json
+import math
 import os
 import posixpath
 import re
@@ -140,17 +142,52 @@ def load(
     ) = None,
     overwrite: "Overwrite previously downloaded (cached) stop data?" = False,
     clear: "Clear existing records from database?" = True,
+    swap: "Load into shadow tables and swap them in when done?" = True,
 ):
     """Geta stop data from TriMet API and load into database.
 
     This combines `get_stops`, `load_stops`, `load_routes`, and
     `load_stop_routes` into a single command for convenience.
 
+    By default, data is loaded into empty shadow tables that are swapped
+    in atomically once everything has been loaded, so the site never
+    sees a partially-loaded network. The previous data is kept so that
+    a bad load can be undone with `rollback-load`.
+
     """
     get_stops(env, out_dir, overwrite=overwrite)
-    load_stops(env, out_dir, clear=clear)
-    load_routes(env, out_dir, clear=clear)
-    load_stop_routes(env, out_dir, clear=clear)
+
+    if not swap:
+        load_stops(env, out_dir, clear=clear)
+        load_routes(env, out_dir, clear=clear)
+        load_stop_routes(env, out_dir, clear=clear)
+        return
+
+    settings = django_settings(env)
+
+    from mystops.loaders import route_geometry, routes, stop_routes, stops
+    from mystops.loaders.shadow import shadow_tables
+
+    data_dir = Path(out_dir or settings.TRIMET_DATA_DIR)
+
+    with shadow_tables():
+        stops.load(data_dir / "stops.json", False)
+        routes.load(data_dir / "routes.json", False)
+        stop_routes.load(data_dir / "stops.json", False)
+        route_geometry.load()
+
+
+@command
+def rollback_load(env):
+    """Swap the previously-loaded stop data back in."""
+    django_settings(env)
+
+    from mystops.loaders.shadow import rollback
+
+    try:
+        rollback()
+    except LookupError as exc:
+        abort(1, str(exc))
 
 
 @command
@@ -189,10 +226,12 @@ def load_stops(
     settings = django_settings(env)
 
     from mystops.loaders.stops import load
+    from mystops.version import bump_data_version
 
     data_dir = data_dir or settings.TRIMET_DATA_DIR
     path = Path(data_dir) / file_name
     load(path, clear)
+    bump_data_version()
 
 
 @command
@@ -206,10 +245,12 @@ def load_routes(
     settings = django_settings(env)
 
     from mystops.loaders.routes import load
+    from mystops.version import bump_data_version
 
     data_dir = data_dir or settings.TRIMET_DATA_DIR
     path = Path(data_dir) / file_name
     load(path, clear)
+    bump_data_version()
 
 
 @command
@@ -219,14 +260,23 @@ def load_stop_routes(
     file_name: "Data file name relative to data directory" = "stops.json",
     clear: "Clear existing stop routes from database?" = True,
 ):
-    """Load stop routes from disk into database."""
+    """Load stop routes from disk into database.
+
+    After stop routes are loaded, the order of stops along each route
+    and each route's line geometry are computed.
+
+    """
     settings = django_settings(env)
 
+    from mystops.loaders import route_geometry
     from mystops.loaders.stop_routes import load
+    from mystops.version import bump_data_version
 
     data_dir = data_dir or settings.TRIMET_DATA_DIR
     path = Path(data_dir) / file_name
     load(path, clear)
+    route_geometry.load()
+    bump_data_version()
 
 
 # Export ---------------------------------------------------------------
@@ -303,6 +353,449 @@ def get_arrivals(env, *stop_ids, route_ids=()):
                 printer.hr(color="none")
 
 
+@command
+def record_arrivals(
+    env,
+    *stop_ids,
+    out_file: arg(short_option="-o") = "arrivals-fixture.json",
+):
+    """Record raw arrivals response from TriMet API for use as a fixture.
+
+    The recorded response can be replayed by the fake TriMet API server
+    (see `fake-trimet` and `load-test`).
+
+    """
+    settings = django_settings(env)
+
+    from mystops.trimet.request import make_request
+
+    params = {"locIDs": ",".join(str(id) for id in stop_ids)}
+    response = make_request("arrivals", settings.TRIMET_API_KEY, params, version=2)
+    with open(out_file, "w") as fp:
+        fp.write(response.text)
+    printer.success(f"Recorded arrivals for {len(stop_ids)} stops to {out_file}")
+
+
+# Benchmarks -----------------------------------------------------------
+
+
+@command
+def benchmark_arrivals(
+    num_stops: "Number of stops in result set" = 50,
+    seed: "Seed for generating arrivals" = 0,
+    repeat: "Number of times to process result set" = 20,
+):
+    """Benchmark processing of a large TriMet arrivals result set.
+
+    The result set is generated (see `mystops.trimet.fake`) and
+    processed both with relative times (the default) and with absolute
+    times.
+
+    """
+    from mystops.trimet.arrivals import process_arrivals
+    from mystops.trimet.fake import generate_arrivals
+
+    root = generate_arrivals(range(1000, 1000 + num_stops), seed=seed)
+    arrivals = root["arrival"]
+
+    printer.header(
+        f"Processing {len(arrivals)} arrivals for {num_stops} stops {repeat} times"
+    )
+    for relative_times in (True, False):
+        label = "relative" if relative_times else "absolute"
+        print_timings(
+            label,
+            lambda: process_arrivals(root, relative_times=relative_times),
+            repeat,
+        )
+
+
+@command
+def benchmark_serializers(
+    num_stops: "Number of stops in stops payload" = 7000,
+    num_arrivals_stops: "Number of stops in arrivals payload" = 50,
+    repeat: "Number of times to serialize each payload" = 20,
+):
+    """Benchmark JSON serializers on stops and arrivals payloads.
+
+    The stops payload has the same shape as the full network `/stops`
+    response, and the arrivals payload is a processed arrivals result
+    like the `/arrivals` endpoint returns.
+
+    """
+    from datetime import datetime, timezone
+
+    from mystops.serializers import SERIALIZERS
+    from mystops.trimet.arrivals import process_arrivals
+    from mystops.trimet.fake import generate_arrivals
+
+    now = datetime.now(timezone.utc)
+    stops = {
+        "stops": tuple(
+            {
+                "id": i,
+                "name": f"SE Somewhere & {i}th",
+                "direction": "northbound",
+                "location": (-122.6 + i / 10000, 45.5 + i / 10000),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(num_stops)
+        ),
+        "count": num_stops,
+    }
+    arrivals = process_arrivals(
+        generate_arrivals(range(1000, 1000 + num_arrivals_stops))
+    )
+
+    for label, data in (("stops", stops), ("arrivals", arrivals)):
+        printer.header(f"Serializing {label} payload {repeat} times")
+        for name, serializer in SERIALIZERS.items():
+            size = len(serializer(data))
+            print_timings(f"{name} ({size:,} bytes)", lambda: serializer(data), repeat)
+
+
+@command
+def benchmark_compression(
+    num_stops: "Number of stops in stops payload" = 7000,
+    repeat: "Number of times to compress payload" = 20,
+    url: "Base URL of running app to get compressed cache hit rate from" = None,
+):
+    """Benchmark compressing the stops payload vs. a cache hit.
+
+    Compares the time to compress a payload shaped like the full network
+    `/stops` response with each supported encoding, at both the on the
+    fly and cached compression levels, to the time to load the
+    precompressed body from the in-process cache (which is what
+    :mod:`mystops.compression` does for unbounded listings).
+
+    If the URL of a running instance of the app is specified, the hit
+    rate of the compressed cache is read from its metrics (e.g., after
+    running `load-test`).
+
+    """
+    import pickle
+
+    from mystops.compression import CACHED_LEVELS, ENCODINGS, LEVELS
+    from mystops.serializers import dump_json_with_orjson
+
+    data = dump_json_with_orjson(
+        {
+            "stops": tuple(
+                {
+                    "id": i,
+                    "name": f"SE Somewhere & {i}th",
+                    "direction": "northbound",
+                    "location": (-122.6 + i / 10000, 45.5 + i / 10000),
+                }
+                for i in range(num_stops)
+            ),
+            "count": num_stops,
+        }
+    )
+
+    printer.header(f"Compressing stops payload ({len(data):,} bytes) {repeat} times")
+    for encoding, compressor in ENCODINGS.items():
+        for level in (LEVELS[encoding], CACHED_LEVELS[encoding]):
+            compressed = compressor(data, level)
+            print_timings(
+                f"{encoding} {level} ({len(compressed):,} bytes)",
+                lambda: compressor(data, level),
+                repeat,
+            )
+        pickled = pickle.dumps(compressed, pickle.HIGHEST_PROTOCOL)
+        print_timings(f"{encoding} (cached)", lambda: pickle.loads(pickled), repeat)
+
+    if url:
+        import requests
+        from prometheus_client.parser import text_string_to_metric_families
+
+        response = requests.get(f"{url.rstrip('/')}/metrics")
+        response.raise_for_status()
+        counts = {"hit": 0, "miss": 0}
+        for family in text_string_to_metric_families(response.text):
+            if family.name != "mystops_cache_requests":
+                continue
+            for sample in family.samples:
+                labels = sample.labels
+                if sample.name.endswith("_total") and labels["cache"] == "compressed":
+                    counts[labels["result"]] += sample.value
+        total = counts["hit"] + counts["miss"]
+        hit_rate = counts["hit"] / total if total else 0
+        printer.header("Compressed cache")
+        printer.print(f"hits = {counts['hit']:.0f}")
+        printer.print(f"misses = {counts['miss']:.0f}")
+        printer.print(f"hit rate = {hit_rate:.1%}")
+
+
+@command
+def benchmark_stops_query(
+    env,
+    bbox: "Bounding box as minx,miny,maxx,maxy" = "-122.69,45.5,-122.65,45.53",
+    repeat: "Number of times to run query" = 100,
+):
+    """Benchmark the bounding box stops query with & without preparing.
+
+    Reports the planning and execution times PostgreSQL reports for the
+    query along with the round trip times for running it unprepared
+    (the way Django runs queries) and as a prepared statement.
+
+    """
+    import psycopg
+
+    django_settings(env)
+
+    from django.db import connection
+
+    from mystops.routes.stops.handlers import GEOJSON_STATEMENT
+
+    params = (*(float(c) for c in bbox.split(",")), None)
+
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {GEOJSON_STATEMENT}", params)
+        plan = cursor.fetchone()[0][0]
+
+    printer.header(f"Stops query for {bbox}")
+    printer.print(f"planning time = {plan['Planning Time']:.2f} ms")
+    printer.print(f"execution time = {plan['Execution Time']:.2f} ms")
+
+    def run_unprepared():
+        with connection.cursor() as cursor:
+            cursor.execute(GEOJSON_STATEMENT, params)
+            cursor.fetchone()
+
+    def run_prepared():
+        with psycopg.Cursor(connection.connection) as cursor:
+            cursor.execute(GEOJSON_STATEMENT, params, prepare=True)
+            cursor.fetchone()
+
+    printer.header(f"Running stops query {repeat} times")
+    print_timings("unprepared", run_unprepared, repeat)
+    print_timings("prepared", run_prepared, repeat)
+
+
+# Load Testing ---------------------------------------------------------
+
+
+@command
+def fake_trimet(
+    env,
+    arrivals_fixture: "Recorded arrivals response (see record-arrivals)" = None,
+    host="localhost",
+    port=8001,
+    latency: "Mean response latency (seconds)" = 0.1,
+    jitter: "Random +/- variation in latency (seconds)" = 0.05,
+    error_rate: "Fraction of requests that fail" = 0.0,
+):
+    """Run local stand-in for TriMet API.
+
+    Start the app with `TRIMET_API_URL=http://<host>:<port>/ws` to point
+    it at the fake API. If no arrivals fixture is specified, synthetic
+    arrivals are generated.
+
+    """
+    settings = django_settings(env)
+
+    from mystops.trimet.fake_server import FakeTriMetServer
+
+    stops_fixture = Path(settings.TRIMET_DATA_DIR) / "raw_stops.json"
+    if not stops_fixture.exists():
+        printer.warning(f"{stops_fixture} not found; stops endpoint disabled")
+        stops_fixture = None
+
+    server = FakeTriMetServer(
+        (host, port),
+        arrivals_fixture,
+        stops_fixture,
+        latency=latency,
+        jitter=jitter,
+        error_rate=error_rate,
+    )
+    printer.info(f"Fake TriMet API running at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for service, count in sorted(server.counts.items()):
+            printer.print(f"{service}: {count}")
+
+
+@command
+def load_test(
+    env,
+    arrivals_fixture: "Recorded arrivals response (see record-arrivals)" = None,
+    url: "Base URL of app" = "http://localhost:8000",
+    duration: "How long to run (seconds)" = 30,
+    concurrency: "Number of concurrent clients" = 8,
+    mix: "Weights of arrivals, bbox stops, and stop detail requests" = "6,3,1",
+    fake_trimet: "Run fake TriMet API in this process?" = True,
+    fake_trimet_port=8001,
+    latency: "Fake TriMet API mean latency (seconds)" = 0.1,
+    jitter: "Fake TriMet API latency variation (seconds)" = 0.05,
+    error_rate: "Fraction of fake TriMet API requests that fail" = 0.0,
+    seed: "Random seed" = 0,
+):
+    """Load test the app with a realistic mix of requests.
+
+    Requests are made against an already-running instance of the app.
+    By default, a fake TriMet API is run in this process and the number
+    of calls the app makes to it are reported. The app must be started
+    with `TRIMET_API_URL=http://localhost:<fake-trimet-port>/ws` to use
+    it.
+
+    Stops are chosen with a skewed distribution (a few stops get most of
+    the traffic) like real usage. Arrivals requests are for 1-3 stops.
+
+    """
+    import random
+    import time
+    from collections import defaultdict
+    from threading import Lock, Thread
+
+    import requests
+
+    settings = django_settings(env)
+
+    from mystops.trimet.fake_server import FakeTriMetServer
+
+    with open(Path(settings.TRIMET_DATA_DIR) / "stops.json") as fp:
+        stops = json.load(fp)["data"]
+    weights = [1 / (rank + 1) for rank in range(len(stops))]
+    random.Random(seed).shuffle(stops)
+
+    kinds = ("arrivals", "stops", "stop")
+    kind_weights = [float(w) for w in mix.split(",")]
+    if len(kind_weights) != len(kinds):
+        abort(1, f"Expected {len(kinds)} weights for mix; got {mix}")
+
+    server = None
+    if fake_trimet:
+        server = FakeTriMetServer(
+            ("localhost", fake_trimet_port),
+            arrivals_fixture,
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            seed=seed,
+        )
+        server.start()
+        printer.info(f"Fake TriMet API running at {server.url}")
+
+    url = url.rstrip("/")
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    lock = Lock()
+    end_time = time.monotonic() + duration
+
+    def make_request(session, rand):
+        kind = rand.choices(kinds, kind_weights)[0]
+        if kind == "arrivals":
+            num_stops = rand.randint(1, 3)
+            stop_ids = {s["id"] for s in rand.choices(stops, weights, k=num_stops)}
+            q = ",".join(str(id) for id in sorted(stop_ids))
+            return kind, session.get(
+                f"{url}/arrivals", params={"q": q, "times": "absolute"}
+            )
+        stop = rand.choices(stops, weights)[0]
+        if kind == "stops":
+            x, y = stop["location"]
+            bbox = f"{x - 0.01},{y - 0.01},{x + 0.01},{y + 0.01}"
+            return kind, session.get(
+                f"{url}/stops",
+                params={"bbox": bbox},
+                headers={"Accept": "application/geo+json"},
+            )
+        return kind, session.get(f"{url}/stops/{stop['id']}")
+
+    def run_client(i):
+        rand = random.Random(seed + i)
+        session = requests.Session()
+        while time.monotonic() < end_time:
+            start = time.perf_counter()
+            try:
+                kind, response = make_request(session, rand)
+            except requests.RequestException:
+                with lock:
+                    errors["connection"] += 1
+                # NOTE: Back off so a down server isn't hammered with
+                #       connection attempts (and the errors aren't
+                #       counted in the thousands).
+                time.sleep(0.5)
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings[kind].append(elapsed)
+                # NOTE: 404s are expected for arrivals when there are no
+                #       arrivals for the requested stops.
+                if response.status_code >= 500:
+                    errors[kind] += 1
+
+    printer.header(f"Load testing {url} for {duration}s with {concurrency} clients...")
+    start = time.monotonic()
+    clients = [Thread(target=run_client, args=(i,)) for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - start
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    all_timings = [t for kind_timings in timings.values() for t in kind_timings]
+    printer.header("Results")
+    printer.print(
+        f"{'':<10} {'count':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+        f"{'errors':>7}"
+    )
+    for kind, kind_timings in (*timings.items(), ("total", all_timings)):
+        if kind == "total":
+            num_errors = sum(errors.values())
+        else:
+            num_errors = errors[kind]
+        p50, p95, p99 = (
+            f"{percentile(kind_timings, p) * 1000:.1f}ms" for p in (50, 95, 99)
+        )
+        printer.print(
+            f"{kind:<10} {len(kind_timings):>7} {len(kind_timings) / elapsed:>8.1f} "
+            f"{p50:>8} {p95:>8} {p99:>8} {num_errors:>7}"
+        )
+    if errors["connection"]:
+        printer.danger(f"Connection errors: {errors['connection']}")
+
+    if server is not None:
+        printer.header("Upstream (fake TriMet API) calls")
+        if not server.counts:
+            printer.warning(
+                "No calls to fake TriMet API; was the app started with "
+                f"TRIMET_API_URL={server.url}?"
+            )
+        for service, count in sorted(server.counts.items()):
+            printer.print(f"{service}: {count}")
+
+
+def percentile(values, p):
+    """Get `p`th percentile of `values` (nearest rank)."""
+    if not values:
+        return 0
+    values = sorted(values)
+    rank = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def print_timings(label, func, repeat):
+    from timeit import repeat as timeit_repeat
+
+    times = timeit_repeat(func, number=1, repeat=repeat)
+    best = min(times) * 1000
+    mean = sum(times) / len(times) * 1000
+    printer.print(f"{label:<24} best = {best:.2f} ms; mean = {mean:.2f} ms")
+
+
 # Provisioning & Deployment --------------------------------------------
 
 
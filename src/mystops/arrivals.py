@@ -0,0 +1,317 @@
+"""Cached arrivals.
+
+This wraps :func:`mystops.trimet.api.get_arrivals` with caching that
+keeps the arrivals endpoint fast and protects workers (and the TriMet
+API) when the API is having problems:
+
+- Results are cached per set of stops. Within the fresh window (see the
+  `MYSTOPS_ARRIVALS_FRESH_TIME` setting), cached results are returned
+  as-is. After that, and until the end of the stale window (see the
+  `MYSTOPS_ARRIVALS_STALE_TIME` setting), cached results are still
+  returned immediately, but a refresh is started in the background
+  (stale-while-revalidate). Only one refresh per set of stops runs at a
+  time across all workers.
+
+- Errors and "no arrivals" results are cached briefly so that repeated
+  requests for the same stops don't each wait on the API.
+
+- The last good arrivals for each stop are kept around. If the API is
+  unavailable, the last good arrivals are returned instead, marked as
+  stale.
+
+All results include an `age` in seconds, which is how long ago the
+arrivals were fetched from TriMet.
+
+When only some routes are requested, a result cached for all routes
+serving the stops is filtered down if there is one, so requests for
+different routes at the same stops share cached results. Otherwise, only
+the requested routes are processed (see
+:func:`mystops.trimet.arrivals.process_arrivals`), and the result is
+cached for just those routes.
+
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import ratelimit
+from .cache import tiered_cache as cache
+from .metrics import record_cache_request, track_trimet_time
+from .profiling import span
+from .stop_metadata import stops as stop_metadata
+from .trimet import api, fake
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "mystops:arrivals"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def get_arrivals(
+    stop_ids: Iterable[int],
+    relative_times=True,
+    route_ids: Iterable[int] = (),
+) -> dict:
+    """Get arrivals for stops.
+
+    The result has the same structure as the result from
+    :func:`api.get_arrivals` (see its docstring regarding
+    `relative_times` and `route_ids`) with these additional fields:
+
+    - `age`: How long ago the arrivals were fetched (seconds)
+    - `stale`: Whether the arrivals are from a previous request because
+      the TriMet API is unavailable
+
+    Raises:
+        The same errors as :func:`api.get_arrivals`. Cached errors are
+        re-raised.
+
+    """
+    stop_ids = sorted(set(stop_ids))
+    route_ids = sorted(set(route_ids))
+    # NOTE: When routes are requested, a result cached for just those
+    #       routes is used if there is one. Otherwise, a result cached
+    #       for all routes is filtered down.
+    for entry_route_ids in dict.fromkeys((tuple(route_ids), ())):
+        with span("cache: arrivals"):
+            entry = cache.get(
+                make_key("result", stop_ids, relative_times, entry_route_ids),
+                local_timeout=get_local_timeout,
+            )
+        if entry is not None:
+            break
+    if entry is None:
+        record_cache_request("arrivals", "miss")
+        return fetch_arrivals(stop_ids, relative_times, route_ids)
+    age = time.time() - entry["time"]
+    if age > settings.MYSTOPS_ARRIVALS_FRESH_TIME:
+        record_cache_request("arrivals", "stale")
+        refresh_in_background(stop_ids, relative_times, entry_route_ids)
+    else:
+        record_cache_request("arrivals", "hit")
+    result = {**entry["result"], "age": round(age)}
+    if not entry_route_ids:
+        result = filter_routes(result, route_ids)
+    return result
+
+
+def get_local_timeout(entry) -> float:
+    """Get how long to keep cached result in process.
+
+    Results are kept in process only while they're fresh so that stale
+    results are always checked against the shared cache, which another
+    worker may have already refreshed.
+
+    """
+    return settings.MYSTOPS_ARRIVALS_FRESH_TIME - (time.time() - entry["time"])
+
+
+def filter_routes(result: dict, route_ids: Iterable[int]) -> dict:
+    """Filter result down to routes with `route_ids`.
+
+    If no route IDs are specified, `result` is returned as-is.
+    Otherwise, a new result is returned; `result` isn't modified.
+
+    """
+    if not route_ids:
+        return result
+    route_ids = set(route_ids)
+    stops = [
+        {
+            **stop,
+            "routes": [route for route in stop["routes"] if route["id"] in route_ids],
+        }
+        for stop in result["stops"]
+    ]
+    return {**result, "count": count_arrivals(stops), "stops": stops}
+
+
+def count_arrivals(stops) -> int:
+    return sum(len(route["arrivals"]) for stop in stops for route in stop["routes"])
+
+
+def fetch_arrivals(
+    stop_ids,
+    relative_times=True,
+    route_ids=(),
+    priority=ratelimit.INTERACTIVE,
+) -> dict:
+    """Fetch arrivals for stops from TriMet API and cache them.
+
+    If `route_ids` are specified, only arrivals for those routes are
+    processed and cached.
+
+    Cached errors and "no arrivals" results are used if present. If the
+    TriMet API can't be reached or the TriMet API request budget is used
+    up (see :mod:`mystops.ratelimit`), the last good arrivals for the
+    stops are returned if they're available.
+
+    """
+    error_key = make_key("error", stop_ids, relative_times, route_ids)
+
+    cached = cache.get(error_key)
+    if cached is not None:
+        record_cache_request("arrivals-error", "hit")
+        if isinstance(cached, Exception):
+            raise cached
+        return cached
+
+    try:
+        root = get_arrivals_result_set(stop_ids, priority)
+        with span("process arrivals"):
+            result = api.process_arrivals(
+                root,
+                route_ids=route_ids,
+                relative_times=relative_times,
+            )
+    except api.TriMetAPIError as exc:
+        stale_result = get_last_good_arrivals(stop_ids, relative_times)
+        if stale_result is not None:
+            record_cache_request("arrivals-last-good", "hit")
+            return filter_routes(stale_result, route_ids)
+        record_cache_request("arrivals-last-good", "miss")
+        if not isinstance(exc, api.TriMetAPIUnavailableError):
+            cache.set(error_key, exc, settings.MYSTOPS_ARRIVALS_ERROR_CACHE_TIME)
+        raise
+    except api.TriMetAPIStopIDNotFoundError as exc:
+        cache.set(error_key, exc, settings.MYSTOPS_ARRIVALS_ERROR_CACHE_TIME)
+        raise
+
+    result["stale"] = False
+    result["age"] = 0
+
+    if result["count"] == 0:
+        cache.set(error_key, result, settings.MYSTOPS_ARRIVALS_ERROR_CACHE_TIME)
+    else:
+        now = time.time()
+        cache.set(
+            make_key("result", stop_ids, relative_times, route_ids),
+            {"result": result, "time": now},
+            settings.MYSTOPS_ARRIVALS_STALE_TIME,
+            local_timeout=settings.MYSTOPS_ARRIVALS_FRESH_TIME,
+        )
+        # NOTE: The last good arrivals are kept for all routes only.
+        if not route_ids:
+            set_last_good_arrivals(result, now, relative_times)
+
+    return result
+
+
+def get_arrivals_result_set(stop_ids, priority=ratelimit.INTERACTIVE) -> dict:
+    """Get raw arrivals result set for stops.
+
+    In DEBUG mode with the `MYSTOPS_USE_FAKE_ARRIVALS_DATA` setting
+    enabled, synthetic arrivals are generated for the stops' actual
+    routes instead of querying the TriMet API (see
+    :mod:`mystops.trimet.fake`). These are processed, cached, etc just
+    like real arrivals.
+
+    """
+    if settings.DEBUG and settings.MYSTOPS_USE_FAKE_ARRIVALS_DATA:
+        stops = {
+            stop_id: {
+                "name": stop["name"],
+                "location": stop["location"],
+                "routes": list(dict.fromkeys(r["id"] for r in stop["routes"])),
+            }
+            for stop_id, stop in stop_metadata.get_many(stop_ids).items()
+        }
+        with span("fake arrivals"):
+            return fake.generate_arrivals(stop_ids, stops=stops)
+    # NOTE: Waiting for budget is kept out of the TriMet timer and span
+    #       below, and budget rejections are only recorded as such (see
+    #       mystops.ratelimit), not as TriMet errors.
+    with span("trimet: budget"):
+        ratelimit.acquire("arrivals", priority)
+    with track_trimet_time("arrivals"), span("trimet: arrivals"):
+        return api.get_arrivals_result_set(settings.TRIMET_API_KEY, stop_ids)
+
+
+def refresh_in_background(stop_ids, relative_times=True, route_ids=()):
+    """Refresh arrivals for stops in a background thread.
+
+    If a refresh for the stops is already in progress in any worker,
+    this does nothing.
+
+    """
+    global _executor
+    lock_key = make_key("refreshing", stop_ids, relative_times, route_ids)
+    # NOTE: The lock expires on its own in case a refresh never
+    #       finishes (e.g., if the worker is killed).
+    if not cache.add(lock_key, True, settings.MYSTOPS_ARRIVALS_FRESH_TIME):
+        return
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=2,
+                    thread_name_prefix="arrivals-refresh",
+                )
+    _executor.submit(refresh, stop_ids, relative_times, route_ids, lock_key)
+
+
+def refresh(stop_ids, relative_times, route_ids, lock_key):
+    try:
+        fetch_arrivals(stop_ids, relative_times, route_ids, ratelimit.BACKGROUND)
+    except Exception as exc:
+        log.warning("Could not refresh arrivals for %s: %s", stop_ids, exc)
+    finally:
+        cache.delete(lock_key)
+        # NOTE: Executor threads aren't request threads, so Django won't
+        #       return their connections to the pool automatically.
+        close_old_connections()
+
+
+def get_last_good_arrivals(stop_ids, relative_times=True) -> Optional[dict]:
+    """Get last good arrivals for stops, if available for *all* stops."""
+    keys = {
+        stop_id: make_key("last-good", [stop_id], relative_times)
+        for stop_id in stop_ids
+    }
+    entries = cache.get_many(keys.values())
+    if len(entries) != len(keys):
+        return None
+    entries = [entries[keys[stop_id]] for stop_id in stop_ids]
+    stops = [entry["stop"] for entry in entries]
+    oldest = min(entries, key=lambda entry: entry["time"])
+    return {
+        "count": count_arrivals(stops),
+        "updateTime": oldest["updateTime"],
+        "stops": stops,
+        "stale": True,
+        "age": round(time.time() - oldest["time"]),
+    }
+
+
+def set_last_good_arrivals(result: dict, now: float, relative_times=True):
+    """Save arrivals for each stop in `result`."""
+    cache.set_many(
+        {
+            make_key("last-good", [stop["id"]], relative_times): {
+                "stop": stop,
+                "updateTime": result["updateTime"],
+                "time": now,
+            }
+            for stop in result["stops"]
+        },
+        settings.MYSTOPS_ARRIVALS_LAST_GOOD_CACHE_TIME,
+    )
+
+
+def make_key(kind, stop_ids, relative_times=True, route_ids=()) -> str:
+    times = "relative" if relative_times else "absolute"
+    ids = ",".join(str(stop_id) for stop_id in stop_ids)
+    if route_ids:
+        ids = f"{ids}:routes={','.join(str(route_id) for route_id in route_ids)}"
+    # NOTE: memcached keys are limited to 250 characters.
+    if len(ids) > 100:
+        ids = hashlib.md5(ids.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{kind}:{times}:{ids}"
@@ -0,0 +1,279 @@
+"""Two-level cache: in-process LRU in front of the shared cache.
+
+Every hit on the shared cache (memcached) costs a network round-trip,
+and the same few keys (e.g., arrivals for popular stops and pages for
+the stops around downtown) are read many times per second by each
+worker. :class:`TieredCache` is a cache backend that keeps recently
+used entries in a small in-process cache in front of a shared cache::
+
+    CACHES.tiered.BACKEND = "mystops.cache.TieredCache"
+    # Alias of the shared cache
+    CACHES.tiered.LOCATION = "default"
+    # Size limit for in-process entries (bytes)
+    CACHES.tiered.OPTIONS.MAX_BYTES = 16777216
+    # Max time to keep entries in process (seconds)
+    CACHES.tiered.OPTIONS.LOCAL_TIMEOUT = 10
+
+Writes go to both tiers. Entries are kept in process for at most
+`LOCAL_TIMEOUT` seconds or the timeout they were set with, whichever is
+shorter, so the in-process tier lags the shared tier by at most
+`LOCAL_TIMEOUT` seconds. Callers that need the tiers to line up more
+closely can pass a shorter `local_timeout` to :meth:`TieredCache.get`
+and :meth:`TieredCache.set`.
+
+Keys are made by this cache (according to its `KEY_PREFIX`, `VERSION`,
+and `KEY_FUNCTION`) and passed as-is to the shared cache, so e.g. a key
+function that includes the network data version (see
+:func:`mystops.version.make_versioned_key`) applies to both tiers.
+
+In-process entries are dropped when the network data version changes
+(see :mod:`mystops.version`), and least recently used entries are
+evicted when the size limit is reached. Caches in front of the same
+shared cache share their in-process entries and size limit.
+
+.. note:: Values are stored pickled in process so that each `get`
+    returns a new copy (cached responses and results may be modified by
+    the caller) and so that entry sizes are known. This doesn't save the
+    unpickling but does save the round-trip, which is most of the cost.
+
+"""
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional, Union
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.connection import ConnectionProxy
+
+from .metrics import record_cache_tier_request, record_local_cache_size
+from .version import get_data_version
+
+TIERED_CACHE_ALIAS = "tiered"
+
+LocalTimeout = Union[None, float, Callable[[object], float]]
+
+
+class LocalCache:
+    """Thread-safe in-process LRU cache with TTLs and a size limit."""
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._version: Optional[int] = None
+
+    def get(self, key) -> Optional[bytes]:
+        self.check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data: bytes, timeout: float):
+        self.check_version()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if timeout <= 0 or len(data) > self.max_bytes:
+                return
+            self._entries[key] = (data, time.monotonic() + timeout)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        record_local_cache_size(self.name, self.size)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        record_local_cache_size(self.name, 0)
+
+    def check_version(self):
+        """Clear entries if the data version has changed."""
+        version = get_data_version()
+        if self._version != version:
+            self.clear()
+            self._version = version
+
+    def _remove(self, key):
+        data, _ = self._entries.pop(key)
+        self.size -= len(data)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# NOTE: Django creates a cache backend instance per thread, so in-process
+#       caches are kept here (keyed by shared cache alias) so that all
+#       threads share them.
+_local_caches: Dict[str, LocalCache] = {}
+_local_caches_lock = Lock()
+
+
+def get_local_cache(name, max_bytes) -> LocalCache:
+    if name not in _local_caches:
+        with _local_caches_lock:
+            if name not in _local_caches:
+                _local_caches[name] = LocalCache(name, max_bytes)
+    return _local_caches[name]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = location or "default"
+        self.local_timeout = float(options.get("LOCAL_TIMEOUT", 10))
+        self.local = get_local_cache(
+            self.shared_alias,
+            int(options.get("MAX_BYTES", 16 * 1024 * 1024)),
+        )
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self.shared_alias]
+
+    def get_local_timeout(self, value, timeout, local_timeout: LocalTimeout):
+        if callable(local_timeout):
+            local_timeout = local_timeout(value)
+        if local_timeout is None:
+            local_timeout = self.local_timeout
+        else:
+            local_timeout = min(local_timeout, self.local_timeout)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        if timeout is None:
+            return local_timeout
+        return min(timeout, local_timeout)
+
+    def set_local(self, key, value, timeout, local_timeout: LocalTimeout = None):
+        timeout = self.get_local_timeout(value, timeout, local_timeout)
+        if timeout > 0:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            self.local.set(key, data, timeout)
+        else:
+            self.local.delete(key)
+
+    def get(self, key, default=None, version=None, local_timeout: LocalTimeout = None):
+        """Get value from in-process cache or, if not present, shared cache.
+
+        When a value is pulled from the shared cache, it's kept in process
+        for `local_timeout` seconds (capped at `LOCAL_TIMEOUT`). This can
+        be a function that takes the value and returns the timeout.
+
+        """
+        key = self.make_and_validate_key(key, version)
+        data = self.local.get(key)
+        if data is not None:
+            record_cache_tier_request(self.shared_alias, "local", "hit")
+            return pickle.loads(data)
+        record_cache_tier_request(self.shared_alias, "local", "miss")
+        value = self.shared.get(key, self._missing_key)
+        if value is self._missing_key:
+            record_cache_tier_request(self.shared_alias, "shared", "miss")
+            return default
+        record_cache_tier_request(self.shared_alias, "shared", "hit")
+        self.set_local(key, value, DEFAULT_TIMEOUT, local_timeout)
+        return value
+
+    def set(
+        self,
+        key,
+        value,
+        timeout=DEFAULT_TIMEOUT,
+        version=None,
+        local_timeout: LocalTimeout = None,
+    ):
+        key = self.make_and_validate_key(key, version)
+        self.shared.set(key, value, timeout)
+        self.set_local(key, value, timeout, local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        added = self.shared.add(key, value, timeout)
+        if added:
+            self.set_local(key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        self.local.delete(key)
+        return self.shared.touch(key, timeout)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        return self.local.get(key) is not None or self.shared.has_key(key)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version): key for key in keys}
+        result = {}
+        missing = []
+        for key, original_key in keys.items():
+            data = self.local.get(key)
+            if data is None:
+                missing.append(key)
+            else:
+                record_cache_tier_request(self.shared_alias, "local", "hit")
+                result[original_key] = pickle.loads(data)
+        if missing:
+            found = self.shared.get_many(missing)
+            for key in missing:
+                record_cache_tier_request(self.shared_alias, "local", "miss")
+                if key in found:
+                    record_cache_tier_request(self.shared_alias, "shared", "hit")
+                    self.set_local(key, found[key], DEFAULT_TIMEOUT)
+                    result[keys[key]] = found[key]
+                else:
+                    record_cache_tier_request(self.shared_alias, "shared", "miss")
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = {self.make_and_validate_key(key, version): key for key in data}
+        data = {key: data[original_key] for key, original_key in keys.items()}
+        failed = self.shared.set_many(data, timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self.set_local(key, value, timeout)
+        return [keys[key] for key in failed]
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version) for key in keys]
+        for key in keys:
+            self.local.delete(key)
+        self.shared.delete_many(keys)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version)
+        self.local.delete(key)
+        return self.shared.incr(key, delta)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+# Like `django.core.cache.cache` but for the tiered cache
+tiered_cache: TieredCache = ConnectionProxy(caches, TIERED_CACHE_ALIAS)
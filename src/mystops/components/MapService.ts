@@ -1,3 +1,4 @@
+import axios from "axios";
 import debounce from "lodash/debounce";
 
 import OLMap from "ol/Map";
@@ -30,6 +31,7 @@ import { transformExtent } from "ol/proj";
 import { Size } from "ol/size";
 
 import {
+  DATA_VERSION_HEADER,
   DEBUG,
   INITIAL_CENTER,
   INITIAL_ZOOM,
@@ -447,21 +449,59 @@ function makeDebugLayer(visible = true): TileLayer<TileDebugSource> {
   return layer;
 }
 
+// Network data version from the most recent GeoJSON response
+let dataVersion: number | null = null;
+
+/**
+ * Update the data version from a response header.
+ *
+ * Versions only increase, so an older version from a cached response
+ * doesn't replace a newer one.
+ */
+function updateDataVersion(header: string | undefined) {
+  const version = header ? parseInt(header, 10) : NaN;
+  if (!isNaN(version) && (dataVersion === null || version > dataVersion)) {
+    dataVersion = version;
+  }
+}
+
 function makeGeoJSONLayer(
   label: string,
   path: string,
   options: any = {},
 ): VectorLayer<VectorSource> {
+  const format = new GeoJSONFormat();
   const source = new VectorSource({
     strategy: bboxLoadingStrategy,
-    format: new GeoJSONFormat(),
-    url: (extent) => {
+    format,
+    loader: (extent, resolution, projection, success, failure) => {
       const bbox = transformExtent(
         extent,
         NATIVE_PROJECTION,
         GEOGRAPHIC_PROJECTION,
       ).join(",");
-      return `${path}?bbox=${bbox}`;
+      // NOTE: Once the data version is known, it's included in the URL
+      //       so that responses are immutable and can be served from
+      //       the nginx cache without hitting the app.
+      const params: Record<string, string> = { bbox };
+      if (dataVersion !== null) {
+        params.v = dataVersion.toString();
+      }
+      axios
+        .get(path, { params, responseType: "text" })
+        .then((response) => {
+          const header = DATA_VERSION_HEADER.toLowerCase();
+          updateDataVersion(response.headers[header]);
+          const features = format.readFeatures(response.data, {
+            featureProjection: projection,
+          }) as Feature[];
+          source.addFeatures(features);
+          success?.(features);
+        })
+        .catch(() => {
+          source.removeLoadedExtent(extent);
+          failure?.();
+        });
     },
   });
   options.minZoom = options.minZoom || FEATURE_LAYER_MIN_ZOOM;
@@ -1,6 +1,7 @@
 import styled from "styled-components";
 
 import { useStateContext } from "../state";
+import { arrivalDesignation, arrivalStatus } from "../utils";
 
 const Container = styled.div`
   animation: fade-in 0.5s;
@@ -18,6 +19,11 @@ const UpdateTime = styled.li`
   border-top: 1px solid var(--menu-item-border-color);
   padding: var(--half-standard-spacing) var(--standard-spacing);
   text-align: right;
+
+  > .stale {
+    color: darkred;
+    font-size: 90%;
+  }
 `;
 
 const Stops = styled.ul`
@@ -93,10 +99,20 @@ export default function ResultComponent() {
     return null;
   }
 
+  const now = new Date();
+
   return (
     <Container id="result">
       <Stops id="stops">
-        <UpdateTime>Updated at {result.updateTime}</UpdateTime>
+        <UpdateTime>
+          Updated at {result.updateTime}
+          {result.age ? ` (${result.age} seconds ago)` : null}
+          {result.stale ? (
+            <div className="stale">
+              TriMet is unavailable. These arrivals may be out of date.
+            </div>
+          ) : null}
+        </UpdateTime>
 
         {result.stops.map((stop) => {
           return (
@@ -115,10 +131,10 @@ export default function ResultComponent() {
                             <Arrival
                               key={i}
                               className={`designation-${
-                                arrival.designation || "none"
+                                arrivalDesignation(arrival, now) || "none"
                               }`}
                             >
-                              <div>{arrival.status}</div>
+                              <div>{arrivalStatus(arrival, now)}</div>
                               <div title={kilometersAway(arrival)}>
                                 {milesAway(arrival)}
                               </div>
@@ -0,0 +1,197 @@
+"""Response compression.
+
+The stops listings (especially the full network and GeoJSON for large
+bounding boxes) are large, highly compressible JSON, so they're
+compressed by :class:`CompressionMiddleware`.
+
+Bounding box and search URLs vary per client, so they're rarely
+requested twice. Their responses are compressed on the fly with fast
+compression levels. Unbounded listings (e.g., the full network) are
+shared by all clients, so they're compressed once per encoding with
+higher levels, and the result is cached in the pages cache, whose keys
+include the network data version (see :mod:`mystops.version`).
+
+Only responses with a strong ETag (see :func:`mystops.http.data_versioned`)
+are compressed, since the ETag and URL together identify the content.
+Other responses are passed through as-is.
+
+The encoding is negotiated via the request's `Accept-Encoding` header.
+Brotli is preferred when the `brotli` package is installed (it's a
+dependency, but it's imported optionally so that gzip can still be used
+if it's missing); otherwise, gzip is used. The encoding is appended to
+the ETag so that each encoded representation has its own strong ETag.
+
+Compression time is recorded in the `mystops_compression_duration_seconds`
+metric and compressed cache hits/misses in `mystops_cache_requests_total`
+(cache = "compressed"), so the CPU time saved is roughly the number of
+hits times the mean compression time (see `benchmark-compression`).
+
+"""
+import gzip
+import hashlib
+import logging
+from time import perf_counter
+from typing import Callable, Dict, Optional, Set
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .metrics import record_cache_request, record_compression_time
+from .profiling import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "mystops:compressed"
+
+# Compression levels for responses compressed on the fly
+LEVELS = {"br": 5, "gzip": 6}
+
+# NOTE: Cached bodies are compressed once per data version, so it's
+#       worth using higher compression levels for them.
+CACHED_LEVELS = {"br": 9, "gzip": 9}
+
+Compressor = Callable[[bytes, int], bytes]
+
+# Supported encodings in order of preference
+ENCODINGS: Dict[str, Compressor] = {}
+if brotli is not None:
+    ENCODINGS["br"] = lambda data, level: brotli.compress(data, quality=level)
+ENCODINGS["gzip"] = lambda data, level: gzip.compress(data, level, mtime=0)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    start = perf_counter()
+    with span(f"compress: {encoding}"):
+        compressed = ENCODINGS[encoding](data, level)
+    record_compression_time(encoding, perf_counter() - start)
+    return compressed
+
+
+def get_encoding(request: HttpRequest) -> Optional[str]:
+    """Get preferred encoding the client accepts, if any.
+
+    The server's preference order is used. Encodings the client
+    explicitly refuses (q=0) are skipped.
+
+    """
+    header = request.headers.get("Accept-Encoding", "")
+    accepted: Set[str] = set()
+    refused: Set[str] = set()
+    for item in header.split(","):
+        name, *params = (part.strip().lower() for part in item.split(";"))
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0
+        (accepted if q > 0 else refused).add(name)
+    for encoding in ENCODINGS:
+        if encoding in refused:
+            continue
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        response = self.get_response(request)
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = get_encoding(request)
+        if encoding is None:
+            return response
+
+        etag = response["ETag"].strip('"')
+        encoded_etag = f'"{etag}-{encoding}"'
+
+        # NOTE: If the client already has this representation, the body
+        #       won't be sent (see mystops.http.ConditionalGetMiddleware),
+        #       so there's no need to get or compress it. This only applies
+        #       to GET requests, since that's all the middleware handles.
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and request.method == "GET":
+            etags = parse_etags(if_none_match)
+            if encoded_etag in etags or "*" in etags:
+                response["ETag"] = encoded_etag
+                return response
+
+        if self.should_cache(request):
+            data = self.get_cached(request, response, encoding, etag)
+        else:
+            data = compress(response.content, encoding, LEVELS[encoding])
+
+        response.content = data
+        response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(data))
+        response["ETag"] = encoded_etag
+        return response
+
+    def get_cached(
+        self, request: HttpRequest, response: HttpResponse, encoding: str, etag: str
+    ) -> bytes:
+        """Get compressed body from cache, compressing it if needed."""
+        path_hash = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+        key = f"{KEY_PREFIX}:{encoding}:{etag}:{path_hash}"
+        cache = caches[settings.CACHE_MIDDLEWARE_ALIAS]
+        cache_time = settings.MYSTOPS_COMPRESSION_CACHE_TIME
+
+        try:
+            data = cache.get(key)
+        except Exception as exc:
+            log.warning("Could not get compressed response from cache: %s", exc)
+            data = None
+
+        if data is None:
+            record_cache_request("compressed", "miss")
+            data = compress(response.content, encoding, CACHED_LEVELS[encoding])
+            try:
+                cache.set(key, data, cache_time)
+            except Exception as exc:
+                log.warning("Could not cache compressed response: %s", exc)
+        else:
+            record_cache_request("compressed", "hit")
+
+        return data
+
+    def should_cache(self, request: HttpRequest) -> bool:
+        """Check whether the compressed body is likely to be reused.
+
+        Only URLs without query parameters other than the data version
+        (e.g., the full stops listing) are cached. Bounding boxes and
+        search terms vary per client, so caching those would mostly fill
+        the cache with single-use entries.
+
+        """
+        return not request.GET.keys() - {"v"}
+
+    def should_compress(self, request: HttpRequest, response: HttpResponse) -> bool:
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if response.status_code != 200 or response.streaming:
+            return False
+        if response.has_header("Content-Encoding"):
+            return False
+        # NOTE: Only responses with a strong ETag are compressed, since
+        #       that's what identifies the content for caching.
+        etag = response.get("ETag")
+        if not etag or etag.startswith("W/"):
+            return False
+        return len(response.content) >= settings.MYSTOPS_COMPRESSION_MIN_SIZE
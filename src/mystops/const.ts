@@ -3,6 +3,7 @@ import { fromLonLat, get as getProjection, Projection } from "ol/proj";
 export const DEBUG = DJANGO_DEBUG;
 export const ARRIVALS_URL = `/arrivals`;
 export const REFRESH_INTERVAL = 30 * 1000; // 30 seconds
+export const DATA_VERSION_HEADER = "X-MyStops-Data-Version";
 
 export const INITIAL_CENTER = fromLonLat([-122.667418, 45.523029]);
 export const INITIAL_ZOOM = 13;
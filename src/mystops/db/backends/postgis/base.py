@@ -0,0 +1,143 @@
+"""PostGIS database backend with psycopg connection pooling.
+
+This is the standard PostGIS backend except that, when the `pool`
+option is set, connections are taken from a per-process psycopg
+connection pool instead of being opened for every request::
+
+    [django]
+    DATABASES.default.ENGINE = "mystops.db.backends.postgis"
+    DATABASES.default.OPTIONS.pool.min_size = 1
+    DATABASES.default.OPTIONS.pool.max_size = 4
+
+The pool options are passed through to
+:class:`psycopg_pool.ConnectionPool`. If `CONN_HEALTH_CHECKS` is
+enabled, connections are checked when they're taken from the pool.
+
+.. note:: Pools can't be shared across forked processes. If the database
+    is used before forking (e.g., in the uWSGI master process), the
+    pools must be closed first with :func:`close_pools`.
+
+"""
+import logging
+import time
+from threading import Lock
+from typing import Dict
+
+from django.contrib.gis.db.backends.postgis.base import (
+    DatabaseWrapper as PostGISDatabaseWrapper,
+)
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from ....metrics import record_db_pool_wait
+
+log = logging.getLogger(__name__)
+
+# Log a warning when getting a connection from a pool takes longer than
+# this (seconds).
+SLOW_WAIT_TIME = 0.5
+
+pools: Dict[str, ConnectionPool] = {}
+pools_lock = Lock()
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    @property
+    def pool(self):
+        """Get connection pool for this database, creating it if needed.
+
+        Returns `None` if pooling isn't enabled for this database.
+
+        """
+        options = self.settings_dict["OPTIONS"].get("pool")
+        if not options or self.alias == NO_DB_ALIAS:
+            return None
+        if self.alias not in pools:
+            with pools_lock:
+                if self.alias not in pools:
+                    pools[self.alias] = self.make_pool(options)
+        return pools[self.alias]
+
+    def make_pool(self, options):
+        if self.settings_dict["CONN_MAX_AGE"]:
+            raise ImproperlyConfigured(
+                "CONN_MAX_AGE must be 0 when connection pooling is enabled"
+            )
+        check = self.settings_dict["CONN_HEALTH_CHECKS"]
+        return ConnectionPool(
+            kwargs=self.get_connection_params(),
+            open=False,
+            check=ConnectionPool.check_connection if check else None,
+            name=self.alias,
+            **options,
+        )
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(
+                isolation_level or IsolationLevel.READ_COMMITTED
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+
+        # NOTE: The pool is opened on first use rather than when it's
+        #       created so that its worker threads are started in the
+        #       process that actually uses it.
+        pool.open()
+        start = time.monotonic()
+        connection = pool.getconn()
+        wait_time = time.monotonic() - start
+        record_db_pool_wait(self.alias, wait_time, pool.get_stats())
+        if wait_time > SLOW_WAIT_TIME:
+            log.warning(
+                "Waited %.3fs for connection from %s pool", wait_time, self.alias
+            )
+
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        self.register_geometry_adapters(connection)
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+                self.connection = None
+        else:
+            return super()._close()
+
+
+def get_pool_stats() -> Dict[str, Dict[str, int]]:
+    """Get stats for each connection pool in this process.
+
+    See :meth:`psycopg_pool.ConnectionPool.get_stats` for the available
+    stats. Of note, `requests_wait_ms` is the total time spent waiting
+    for connections and `requests_num` is the number of requests for
+    connections, so the mean wait time is the former divided by the
+    latter.
+
+    """
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """Close all connection pools in this process."""
+    with pools_lock:
+        for pool in pools.values():
+            pool.close()
+        pools.clear()
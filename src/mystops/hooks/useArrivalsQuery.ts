@@ -89,7 +89,9 @@ async function arrivalsQuery(
   try {
     response = await axios.get(ARRIVALS_URL, {
       cancelToken,
-      params: { q: stops.join(",") },
+      // NOTE: Statuses are formatted relative to now client side so
+      //       that responses can be shared from cache.
+      params: { q: stops.join(","), times: "absolute" },
     });
   } catch (err: any) {
     if (axios.isCancel(err)) {
@@ -0,0 +1,106 @@
+from functools import wraps
+
+from django.http import HttpRequest, HttpResponse
+from django.middleware.http import (
+    ConditionalGetMiddleware as BaseConditionalGetMiddleware,
+)
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .serializers import dump_json
+from .version import get_data_version
+
+# Max age for versioned URLs (see :func:`data_versioned`). Note that this
+# is capped at the server side cache time for handlers with a cache time.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+DATA_VERSION_HEADER = "X-MyStops-Data-Version"
+
+
+class JsonResponse(HttpResponse):
+    """JSON response using the configured serializer.
+
+    Handlers can return this instead of a dict to use the fast JSON
+    serializer (see :mod:`mystops.serializers`).
+
+    """
+
+    def __init__(self, data, content_type="application/json", **kwargs):
+        super().__init__(dump_json(data), content_type=content_type, **kwargs)
+
+
+def data_versioned(max_age, variant=None, vary_on=()):
+    """Add caching headers to responses derived from the network data.
+
+    Responses get a strong ETag derived from the network data version
+    (see :mod:`mystops.version`), so clients and proxies can revalidate
+    cheaply, and the data version is included in the
+    `X-MyStops-Data-Version` header.
+
+    If the request's `v` query parameter is the current data version,
+    the URL is considered versioned: its content will never change, so
+    the response is marked `public, immutable` with a long max age. That
+    way, a CDN or nginx in front of the app can serve it without ever
+    revalidating.
+
+    Otherwise, clients cache the response for `max_age` seconds, but
+    shared caches (nginx, CDNs) must revalidate it on every request
+    (`s-maxage=0`), since the content changes when new network data is
+    loaded. Revalidation is cheap since the ETag only depends on the
+    data version.
+
+    Args:
+        max_age: Max age for unversioned URLs in clients (seconds)
+        variant: If the same URL can return different representations
+            (e.g., JSON or GeoJSON depending on the `Accept` header),
+            a function that takes the request and returns a name for
+            the representation, which is included in the ETag
+        vary_on: Request headers that the representation depends on
+            (added to the `Vary` header)
+
+    .. note:: 304 responses are handled by
+        :class:`ConditionalGetMiddleware`, which also handles responses
+        pulled from the server side page cache.
+
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if not isinstance(response, HttpResponse) or response.status_code != 200:
+                return response
+            version = get_data_version()
+            etag = f"{version}-{variant(request)}" if variant else str(version)
+            response["ETag"] = f'"{etag}"'
+            response[DATA_VERSION_HEADER] = str(version)
+            if request.GET.get("v") == str(version):
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=IMMUTABLE_MAX_AGE,
+                    immutable=True,
+                )
+            else:
+                patch_cache_control(response, public=True, max_age=max_age, s_maxage=0)
+            if vary_on:
+                patch_vary_headers(response, vary_on)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalGetMiddleware(BaseConditionalGetMiddleware):
+    """Return 304 responses for GET requests with a matching ETag.
+
+    Unlike Django's version, this doesn't hash the content of responses
+    that don't have an ETag, since that would mean hashing large
+    responses (e.g., all the stops in the network) on every request.
+    Only responses that set their own ETag (see :func:`data_versioned`)
+    are handled.
+
+    """
+
+    def needs_etag(self, response):
+        return False
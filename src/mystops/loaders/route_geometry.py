@@ -0,0 +1,99 @@
+"""Precompute stop order and simplified line geometry for routes.
+
+TriMet's stops data says which routes serve each stop but not the order
+of the stops along a route, so the order is approximated: starting from
+the stop farthest from the middle of the route (which will be at or
+near one end), the nearest unvisited stop is repeatedly chosen next.
+
+A simplified line through the ordered stops is then saved for each
+route so that routes can be drawn without pulling all of their stops.
+
+"""
+import math
+from collections import defaultdict
+
+from django.db import connection
+
+from ..models import Route, Stop, StopRoute
+
+# Tolerance for simplifying route lines (degrees; ~10 meters)
+SIMPLIFY_TOLERANCE = 0.0001
+
+# Longitude degrees are shorter than latitude degrees at Portland's
+# latitude, so longitude differences are scaled by this when comparing
+# distances.
+LNG_SCALE = math.cos(math.radians(45.5))
+
+
+def load(batch_size=1000):
+    print("Ordering stops along routes...", end="", flush=True)
+    stop_routes = StopRoute.objects.values_list("id", "route_id", "stop__location")
+    route_stops = defaultdict(list)
+    for id, route_id, location in stop_routes:
+        route_stops[route_id].append((id, location.x * LNG_SCALE, location.y))
+    records = []
+    for stops in route_stops.values():
+        for sequence, id in enumerate(order_stops(stops)):
+            records.append(StopRoute(id=id, sequence=sequence))
+    StopRoute.objects.bulk_update(records, ["sequence"], batch_size=batch_size)
+    print("Done")
+
+    print("Computing route geometry...", end="", flush=True)
+    route_table = Route._meta.db_table
+    stop_table = Stop._meta.db_table
+    stop_route_table = StopRoute._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""\
+UPDATE {route_table} AS route SET geometry = line.geometry FROM (
+  SELECT
+    stop_route.route_id,
+    ST_Simplify(
+      ST_MakeLine(stop.location ORDER BY stop_route.sequence), %s, true
+    ) AS geometry
+  FROM
+    {stop_route_table} AS stop_route
+  JOIN
+    {stop_table} AS stop
+    ON stop_route.stop_id = stop.id
+  GROUP BY
+    stop_route.route_id
+  HAVING
+    count(*) > 1
+) AS line
+WHERE
+  line.route_id = route.id\
+""",
+            [SIMPLIFY_TOLERANCE],
+        )
+    print("Done")
+
+
+def order_stops(stops):
+    """Order stops along a route.
+
+    Args:
+        stops: Sequence of (id, x, y)
+
+    Returns:
+        list: Stop IDs in order
+
+    """
+    if not stops:
+        return []
+
+    n = len(stops)
+    mid_x = sum(x for _, x, _ in stops) / n
+    mid_y = sum(y for _, _, y in stops) / n
+    remaining = list(stops)
+    current = max(remaining, key=lambda s: (s[1] - mid_x) ** 2 + (s[2] - mid_y) ** 2)
+    remaining.remove(current)
+    ordered = [current[0]]
+
+    while remaining:
+        _, x, y = current
+        current = min(remaining, key=lambda s: (s[1] - x) ** 2 + (s[2] - y) ** 2)
+        remaining.remove(current)
+        ordered.append(current[0])
+
+    return ordered
@@ -0,0 +1,212 @@
+"""Load network data into shadow tables and swap them in atomically.
+
+The stop, route, and stop route tables are served from while network
+data is being loaded, so loading directly into them exposes partially
+loaded data to the map and the arrivals endpoint. Instead, the loaders
+can be run against empty "shadow" copies of the tables (``stop_new``,
+etc). Once everything has been loaded, the shadow tables are analyzed
+and then renamed into place in a single transaction.
+
+The previously-live tables are kept around as ``stop_old``, etc until
+the next load so that a bad load can be rolled back with
+:func:`rollback`.
+
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from ..models import Route, Stop, StopRoute
+from ..version import bump_data_version
+
+# NOTE: The order matters--stop_route references both stop and route.
+MODELS = (Stop, Route, StopRoute)
+TABLES = tuple(model._meta.db_table for model in MODELS)
+
+NEW_SUFFIX = "_new"
+OLD_SUFFIX = "_old"
+
+
+@contextmanager
+def shadow_tables():
+    """Point models at shadow tables while loading.
+
+    Within the context, the :class:`Stop`, :class:`Route`, and
+    :class:`StopRoute` models read from and write to the shadow tables.
+    When the context exits normally, the shadow tables are analyzed and
+    swapped in. If an error occurs, the shadow tables are dropped and
+    the live tables are left as-is.
+
+    """
+    create()
+    try:
+        with use_tables(NEW_SUFFIX):
+            yield
+    except BaseException:
+        drop(NEW_SUFFIX)
+        raise
+    analyze(NEW_SUFFIX)
+    swap()
+
+
+@contextmanager
+def use_tables(suffix):
+    """Temporarily point models at the tables with `suffix`."""
+    for model in MODELS:
+        model._meta.db_table = f"{model._meta.db_table}{suffix}"
+    try:
+        yield
+    finally:
+        for model in MODELS:
+            model._meta.db_table = model._meta.db_table[: -len(suffix)]
+
+
+def create():
+    """Create empty shadow tables.
+
+    The shadow tables have the same columns, defaults, constraints, and
+    indexes as the live tables. Foreign keys aren't copied by ``LIKE``,
+    so they're recreated pointing at the other shadow tables.
+
+    """
+    print("Creating shadow tables...")
+    drop(NEW_SUFFIX)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(
+                f"CREATE TABLE {table}{NEW_SUFFIX} (LIKE {table} INCLUDING ALL)"
+            )
+        for table in TABLES:
+            for name, definition in get_foreign_keys(cursor, table):
+                definition = re.sub(
+                    r"REFERENCES (\w+)\(",
+                    rf"REFERENCES \1{NEW_SUFFIX}(",
+                    definition,
+                )
+                cursor.execute(
+                    f"ALTER TABLE {table}{NEW_SUFFIX} "
+                    f"ADD CONSTRAINT {name} {definition}"
+                )
+
+
+def drop(suffix):
+    """Drop tables with `suffix` if they exist."""
+    tables = ", ".join(f"{table}{suffix}" for table in TABLES)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {tables}")
+
+
+def analyze(suffix=""):
+    """Update planner statistics for tables with `suffix`."""
+    print("Analyzing tables...")
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"ANALYZE {table}{suffix}")
+
+
+def swap():
+    """Swap shadow tables in, keeping previous tables for rollback.
+
+    Renaming only requires a brief exclusive lock, and since all the
+    renames happen in one transaction, readers see either the old
+    network or the new one, never a mix.
+
+    """
+    print("Swapping in shadow tables...")
+    with transaction.atomic(), connection.cursor() as cursor:
+        # NOTE: The previous tables are dropped in the same transaction
+        #       so that they're kept if the swap fails.
+        drop(OLD_SUFFIX)
+        lock(cursor)
+        for table in TABLES:
+            exchange(cursor, table, f"{table}{NEW_SUFFIX}")
+            rename(cursor, f"{table}{NEW_SUFFIX}", f"{table}{OLD_SUFFIX}")
+    bump_data_version()
+
+
+def rollback():
+    """Swap the previous tables back in.
+
+    The tables being replaced are kept, so running this again will undo
+    the rollback.
+
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f"{TABLES[0]}{OLD_SUFFIX}"])
+        if cursor.fetchone()[0] is None:
+            raise LookupError("No previous tables to roll back to")
+    print("Swapping in previous tables...")
+    with transaction.atomic(), connection.cursor() as cursor:
+        lock(cursor)
+        for table in TABLES:
+            exchange(cursor, table, f"{table}{OLD_SUFFIX}")
+    bump_data_version()
+
+
+def lock(cursor):
+    # NOTE: Taking all the locks up front in a consistent order avoids
+    #       deadlocking with readers that join across the tables.
+    tables = ", ".join(TABLES)
+    cursor.execute(f"LOCK TABLE {tables} IN ACCESS EXCLUSIVE MODE")
+
+
+def exchange(cursor, table, other):
+    """Exchange names of `table` and `other` along with their indexes.
+
+    Index names are exchanged too so that the live table's indexes keep
+    the names that migrations expect.
+
+    """
+    pairs = pair_indexes(cursor, table, other)
+    rename(cursor, table, f"{table}_swap")
+    rename(cursor, other, table)
+    rename(cursor, f"{table}_swap", other)
+    for i, (name, other_name) in enumerate(pairs):
+        tmp_name = f"{table}_swap_{i}"
+        rename(cursor, name, tmp_name, "INDEX")
+        rename(cursor, other_name, name, "INDEX")
+        rename(cursor, tmp_name, other_name, "INDEX")
+
+
+def rename(cursor, name, new_name, kind="TABLE"):
+    cursor.execute(f"ALTER {kind} {name} RENAME TO {new_name}")
+
+
+def pair_indexes(cursor, table, other):
+    """Pair up equivalent indexes on `table` and `other`.
+
+    Indexes are matched by their definitions with the index and table
+    names removed.
+
+    """
+    indexes = get_indexes(cursor, table)
+    other_indexes = get_indexes(cursor, other)
+    return [
+        (name, other_indexes[definition])
+        for definition, name in indexes.items()
+        if definition in other_indexes
+    ]
+
+
+def get_indexes(cursor, table):
+    """Get indexes for `table` as a map of definition => name."""
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = %s",
+        [table],
+    )
+    return {
+        re.sub(r"INDEX \S+ ON \S+", "INDEX ON", definition): name
+        for name, definition in cursor.fetchall()
+    }
+
+
+def get_foreign_keys(cursor, table):
+    """Get foreign key constraints for `table` as (name, definition)."""
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return cursor.fetchall()
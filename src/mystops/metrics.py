@@ -0,0 +1,249 @@
+"""Prometheus metrics.
+
+Metrics are exposed in the Prometheus text format at `/metrics`.
+
+- Request latency per handler, along with time spent querying the
+  database per request, are recorded by :class:`MetricsMiddleware`,
+  which is added via the `PREPEND_MIDDLEWARE` setting.
+
+- Database connection pool wait time and pool usage, TriMet API time,
+  TriMet API budget usage (see :mod:`mystops.ratelimit`), JSON
+  serialization time, response compression time (see
+  :mod:`mystops.compression`), and cache hits and misses (including per
+  tier for :mod:`mystops.cache`) are recorded where they happen.
+
+When running under uWSGI, each worker process has its own metrics, so
+the `PROMETHEUS_MULTIPROC_DIR` environment variable must be set to a
+directory that's writable by the workers (and cleared on deploy); the
+metrics from all workers are then combined when they're collected. If
+it's not set, metrics are for the current process only. When a worker
+exits, :func:`mark_process_dead` must be called so that "live" gauges
+stop including it (see :func:`mystops.startup.register_exit_hook`).
+
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import List, Optional
+
+from django.db import connection
+from django.http import HttpRequest
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_DURATION = Histogram(
+    "mystops_request_duration_seconds",
+    "Time spent handling requests",
+    ["handler", "method", "status"],
+)
+
+REQUEST_DB_DURATION = Histogram(
+    "mystops_request_db_duration_seconds",
+    "Time spent querying the database per request",
+    ["handler"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+DB_POOL_WAIT_DURATION = Histogram(
+    "mystops_db_pool_wait_duration_seconds",
+    "Time spent waiting for a connection from the database connection pool",
+    ["database"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10),
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "mystops_db_pool_connections",
+    "Database connection pool connections (size, available) and waiting requests",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+
+TRIMET_DURATION = Histogram(
+    "mystops_trimet_duration_seconds",
+    "Time spent getting data from the TriMet API",
+    ["service", "outcome"],
+)
+
+SERIALIZATION_DURATION = Histogram(
+    "mystops_serialization_duration_seconds",
+    "Time spent serializing JSON responses",
+    ["serializer"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+COMPRESSION_DURATION = Histogram(
+    "mystops_compression_duration_seconds",
+    "Time spent compressing response bodies",
+    ["encoding"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+CACHE_REQUESTS = Counter(
+    "mystops_cache_requests_total",
+    "Cache lookups by cache and result (hit, miss, stale, etc)",
+    ["cache", "result"],
+)
+
+CACHE_TIER_REQUESTS = Counter(
+    "mystops_cache_tier_requests_total",
+    "Tiered cache lookups by tier (local, shared) and result (hit, miss)",
+    ["cache", "tier", "result"],
+)
+
+LOCAL_CACHE_BYTES = Gauge(
+    "mystops_local_cache_bytes",
+    "Size of in-process cache entries",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+TRIMET_BUDGET_REQUESTS = Counter(
+    "mystops_trimet_budget_requests_total",
+    "TriMet API budget requests by priority and outcome (allowed, waited, rejected)",
+    ["priority", "outcome"],
+)
+
+TRIMET_BUDGET_USED = Gauge(
+    "mystops_trimet_budget_used_ratio",
+    "Fraction of the TriMet API request budget used in the current window",
+    multiprocess_mode="livemax",
+)
+
+# Database time for the current request, if any. This is a list so that
+# it can be added to from nested contexts.
+_db_time: ContextVar[Optional[List[float]]] = ContextVar("db_time", default=None)
+
+
+class MetricsMiddleware:
+    """Record request duration and database time per handler."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        db_time = [0.0]
+        token = _db_time.set(db_time)
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(record_query_time):
+                response = self.get_response(request)
+        finally:
+            _db_time.reset(token)
+        duration = perf_counter() - start
+        handler = get_handler_name(request)
+        REQUEST_DURATION.labels(
+            handler,
+            request.method,
+            response.status_code,
+        ).observe(duration)
+        REQUEST_DB_DURATION.labels(handler).observe(db_time[0])
+        return response
+
+
+def get_handler_name(request: HttpRequest) -> str:
+    """Get name of handler for request (its URL pattern)."""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    return match.route or "/"
+
+
+def record_query_time(execute, sql, params, many, context):
+    with track_db_time():
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def track_db_time():
+    """Add time spent in context to the current request's DB time.
+
+    Queries run through Django cursors are tracked automatically; this
+    is for queries that are run on raw database connections.
+
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        db_time = _db_time.get()
+        if db_time is not None:
+            db_time[0] += perf_counter() - start
+
+
+@contextmanager
+def track_trimet_time(service):
+    """Record time spent in context getting data from TriMet API."""
+    start = perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        TRIMET_DURATION.labels(service, outcome).observe(perf_counter() - start)
+
+
+def record_db_pool_wait(database, wait_time, stats):
+    DB_POOL_WAIT_DURATION.labels(database).observe(wait_time)
+    for state, key in (
+        ("size", "pool_size"),
+        ("available", "pool_available"),
+        ("waiting", "requests_waiting"),
+    ):
+        DB_POOL_CONNECTIONS.labels(database, state).set(stats.get(key, 0))
+
+
+def record_cache_request(cache, result):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def record_cache_tier_request(cache, tier, result):
+    CACHE_TIER_REQUESTS.labels(cache, tier, result).inc()
+
+
+def record_local_cache_size(cache, size):
+    LOCAL_CACHE_BYTES.labels(cache).set(size)
+
+
+def record_compression_time(encoding, duration):
+    COMPRESSION_DURATION.labels(encoding).observe(duration)
+
+
+def record_trimet_budget(priority, outcome):
+    TRIMET_BUDGET_REQUESTS.labels(priority, outcome).inc()
+
+
+def record_trimet_budget_used(count, limit):
+    TRIMET_BUDGET_USED.set(min(count / limit, 1.0) if limit else 1.0)
+
+
+def mark_process_dead(pid=None):
+    """Remove "live" gauge values for exited process.
+
+    `pid` defaults to the current process. This does nothing when not
+    running in multiprocess mode.
+
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def get_metrics():
+    """Get metrics in Prometheus text format.
+
+    Returns:
+        (content, content type)
+
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,29 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mystops", "0002_add_page_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="geometry",
+            field=django.contrib.gis.db.models.fields.LineStringField(
+                null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="stoproute",
+            name="sequence",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="stoproute",
+            index=models.Index(
+                fields=["route", "stop"], name="stop_route_route_stop_idx"
+            ),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from .data_version import DataVersion
 from .page import Page
 from .route import Route
 from .stop import Stop, StopRoute
@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class DataVersion(models.Model):
+    """Network data version (see :mod:`mystops.version`).
+
+    There's only ever one row, which is updated after each load.
+
+    """
+
+    class Meta:
+        db_table = "data_version"
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    version = models.BigIntegerField()
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Data version: {self.version} (updated {self.updated})"
@@ -34,6 +34,10 @@ class Route(models.Model):
     short_name = models.TextField()
     description = models.TextField()
 
+    # Simplified line through the route's stops in order. This is
+    # computed when stop routes are loaded.
+    geometry = models.LineStringField(null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1,13 +1,22 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
 
 
 class StopRoute(models.Model):
     class Meta:
         db_table = "stop_route"
+        indexes = [
+            models.Index(fields=["route", "stop"], name="stop_route_route_stop_idx"),
+        ]
 
     stop = models.ForeignKey("mystops.Stop", on_delete=models.CASCADE)
     route = models.ForeignKey("mystops.Route", on_delete=models.CASCADE)
 
+    # Position of stop along route. TriMet doesn't provide this, so it's
+    # approximated when stop routes are loaded (see
+    # :mod:`mystops.loaders.route_geometry`).
+    sequence = models.PositiveIntegerField(null=True)
+
     def __str__(self):
         return f"{self.stop} : {self.route}"
 
@@ -15,6 +24,14 @@ class StopRoute(models.Model):
 class Stop(models.Model):
     class Meta:
         db_table = "stop"
+        indexes = [
+            # For searching stops by name (see /stops/search)
+            GinIndex(
+                fields=["name"],
+                name="stop_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     id = models.AutoField(primary_key=True)
 
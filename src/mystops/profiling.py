@@ -0,0 +1,156 @@
+"""Opt-in request profiling.
+
+When enabled via the `MYSTOPS_PROFILING_ENABLED` setting,
+:class:`ProfilingMiddleware` records a breakdown of where time goes for
+each request as a list of spans (database queries, TriMet API requests,
+processing arrivals, etc). Code that does something potentially slow
+marks it with :func:`span`.
+
+A profile is written to `MYSTOPS_PROFILING_DIR` when:
+
+- The request includes the `X-MyStops-Profile` header and comes from
+  one of the `MYSTOPS_PROFILING_ALLOWED_IPS`. The request is also run
+  under cProfile.
+
+- The request takes longer than `MYSTOPS_PROFILING_SLOW_TIME` seconds.
+  A fraction of requests (see `MYSTOPS_PROFILING_SAMPLE_RATE`) are run
+  under cProfile so that slow requests will sometimes have a cProfile
+  dump too.
+
+Each profile is a JSON file with the request info and spans, along with
+a `.prof` file containing the cProfile stats, if the request was run
+under cProfile; these can be viewed with `python -m pstats` or a tool
+like snakeviz. Only the newest `MYSTOPS_PROFILING_MAX_PROFILES` profiles
+are kept.
+
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpRequest
+
+log = logging.getLogger(__name__)
+
+HEADER = "X-MyStops-Profile"
+
+# Spans for the current request, if it's being profiled
+_spans: ContextVar[Optional[List[dict]]] = ContextVar("spans", default=None)
+
+# Only one cProfile profiler can be active at a time in some versions of
+# Python, so only one request at a time is run under cProfile.
+_cprofile_lock = Lock()
+
+
+@contextmanager
+def span(name):
+    """Record time spent in context as a span named `name`.
+
+    If the current request isn't being profiled, this does nothing.
+
+    """
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        duration = perf_counter() - start
+        spans.append({"name": name, "start": start, "duration": duration})
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.MYSTOPS_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(settings.MYSTOPS_PROFILING_DIR)
+
+    def __call__(self, request: HttpRequest):
+        requested = (
+            HEADER in request.headers
+            and request.META.get("REMOTE_ADDR")
+            in settings.MYSTOPS_PROFILING_ALLOWED_IPS
+        )
+        use_cprofile = (
+            requested or random.random() < settings.MYSTOPS_PROFILING_SAMPLE_RATE
+        ) and _cprofile_lock.acquire(blocking=False)
+
+        spans: List[dict] = []
+        token = _spans.set(spans)
+        profiler = cProfile.Profile() if use_cprofile else None
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(record_query_span):
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:
+                        # Another profiler is active (e.g., a debugger)
+                        profiler = None
+                        _cprofile_lock.release()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+                        _cprofile_lock.release()
+        finally:
+            _spans.reset(token)
+        duration = perf_counter() - start
+
+        if requested or duration > settings.MYSTOPS_PROFILING_SLOW_TIME:
+            try:
+                self.save(request, response, start, duration, spans, profiler)
+            except OSError as exc:
+                log.warning("Could not save profile: %s", exc)
+
+        return response
+
+    def save(self, request, response, start, duration, spans, profiler):
+        directory = self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+        name = f"{timestamp}-{os.getpid()}-{id(request):x}"
+        data = {
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration": duration,
+            "spans": [
+                {**s, "start": s["start"] - start}
+                for s in sorted(spans, key=lambda s: s["start"])
+            ],
+        }
+        with (directory / f"{name}.json").open("w") as fp:
+            json.dump(data, fp, indent=2)
+        if profiler is not None:
+            profiler.dump_stats(directory / f"{name}.prof")
+        prune(directory, settings.MYSTOPS_PROFILING_MAX_PROFILES)
+
+
+def record_query_span(execute, sql, params, many, context):
+    with span(f"db: {sql[:60]}"):
+        return execute(sql, params, many, context)
+
+
+def prune(directory: Path, max_profiles: int):
+    """Remove all but the newest `max_profiles` profiles."""
+    profiles = sorted(directory.glob("*.json"), reverse=True)
+    for path in profiles[max_profiles:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".prof").unlink(missing_ok=True)
@@ -0,0 +1,101 @@
+"""Shared TriMet API request budget.
+
+All requests to the TriMet API are made with a single API key, so a
+spike in traffic could use up the key's quota or get it throttled. To
+prevent that, requests draw from a budget that's shared by all workers
+via the cache: at most `MYSTOPS_TRIMET_RATE_LIMIT` requests are allowed
+per `MYSTOPS_TRIMET_RATE_WINDOW` seconds.
+
+Requests have one of two priorities:
+
+- Interactive requests (made while a client is waiting) can use the
+  entire budget. When the budget is used up, they wait for the next
+  window, up to `MYSTOPS_TRIMET_RATE_LIMIT_MAX_WAIT` seconds.
+
+- Background requests (e.g., stale-while-revalidate refreshes) can use
+  only `MYSTOPS_TRIMET_RATE_LIMIT_BACKGROUND_SHARE` of the budget so
+  that there's always some left for interactive requests. They don't
+  wait; they're skipped, and the cached arrivals are served until
+  they're refreshed later.
+
+When a request can't be made, :class:`TriMetAPIRateLimitedError` is
+raised, which is handled like other TriMet API unavailability errors
+(i.e., the last good arrivals are returned, if available).
+
+.. note:: The cache only supports atomic increments, not compare and
+    swap, so this is implemented as a fixed window counter rather than
+    a true token bucket. The window is short, so the difference (up to
+    2x the budget in bursts that straddle windows) doesn't matter much.
+
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import record_trimet_budget, record_trimet_budget_used
+from .trimet.exc import TriMetAPIRateLimitedError
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "mystops:trimet-budget"
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+
+def acquire(service, priority=INTERACTIVE):
+    """Use one request from the TriMet API budget for `service`.
+
+    Raises:
+        TriMetAPIRateLimitedError: When the budget for `priority` is
+            used up (after waiting, for interactive requests)
+
+    """
+    limit = settings.MYSTOPS_TRIMET_RATE_LIMIT
+    window = settings.MYSTOPS_TRIMET_RATE_WINDOW
+    if priority == BACKGROUND:
+        limit = int(limit * settings.MYSTOPS_TRIMET_RATE_LIMIT_BACKGROUND_SHARE)
+        max_wait = 0
+    else:
+        max_wait = settings.MYSTOPS_TRIMET_RATE_LIMIT_MAX_WAIT
+
+    deadline = time.time() + max_wait
+    waited = False
+    while True:
+        now = time.time()
+        window_id = int(now // window)
+        if try_acquire(window_id, limit, priority):
+            record_trimet_budget(priority, "waited" if waited else "allowed")
+            return
+        next_window = (window_id + 1) * window
+        if next_window > deadline:
+            break
+        time.sleep(next_window - now)
+        waited = True
+
+    record_trimet_budget(priority, "rejected")
+    raise TriMetAPIRateLimitedError(service)
+
+
+def try_acquire(window_id, limit, priority) -> bool:
+    key = f"{KEY_PREFIX}:{window_id}"
+    # NOTE: Keys expire a little after their window ends.
+    timeout = settings.MYSTOPS_TRIMET_RATE_WINDOW * 2
+    try:
+        if priority == BACKGROUND:
+            # NOTE: Background requests check the count *before*
+            #       incrementing it so that they don't eat into the
+            #       interactive share when they're rejected.
+            if cache.get(key, 0) >= limit:
+                return False
+        cache.add(key, 0, timeout)
+        count = cache.incr(key)
+    except Exception as exc:
+        # NOTE: If the cache is unavailable, requests are allowed rather
+        #       than failing every request.
+        log.warning("Could not check TriMet API budget: %s", exc)
+        return True
+    record_trimet_budget_used(count, settings.MYSTOPS_TRIMET_RATE_LIMIT)
+    return count <= limit
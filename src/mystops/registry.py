@@ -0,0 +1,58 @@
+"""In-process registry of valid stop IDs.
+
+This is used to check that stop IDs exist without querying the
+database. Stop IDs are kept in a sorted array of unsigned ints, which
+is compact enough to keep a copy of the entire network in each worker
+(~7,000 stops => ~28 KB).
+
+The registry is loaded on first use and reloaded when the network data
+version changes (see :mod:`mystops.version`).
+
+"""
+from array import array
+from bisect import bisect_left
+from threading import Lock
+from typing import Iterable, Optional, Set
+
+from .models import Stop
+from .version import get_data_version
+
+
+class StopIDRegistry:
+    def __init__(self):
+        self._lock = Lock()
+        self._ids = array("I")
+        self._version: Optional[int] = None
+
+    def load(self):
+        """Load stop IDs from database."""
+        # NOTE: The version is read *before* querying so that a load
+        #       that happens in the meantime will trigger a reload.
+        version = get_data_version()
+        ids = Stop.objects.order_by("stop_id").values_list("stop_id", flat=True)
+        self._ids = array("I", ids)
+        self._version = version
+
+    def refresh(self):
+        """Reload stop IDs if the data version has changed."""
+        if self._version != get_data_version():
+            with self._lock:
+                if self._version != get_data_version():
+                    self.load()
+
+    def __contains__(self, stop_id: int) -> bool:
+        self.refresh()
+        ids = self._ids
+        i = bisect_left(ids, stop_id)
+        return i != len(ids) and ids[i] == stop_id
+
+    def __len__(self):
+        self.refresh()
+        return len(self._ids)
+
+    def missing(self, stop_ids: Iterable[int]) -> Set[int]:
+        """Return the stop IDs that *aren't* in the registry."""
+        return {stop_id for stop_id in stop_ids if stop_id not in self}
+
+
+stop_ids = StopIDRegistry()
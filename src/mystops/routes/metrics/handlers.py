@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+
+from ...metrics import get_metrics
+
+
+@never_cache
+def get(request: HttpRequest):
+    """Return metrics in Prometheus text format.
+
+    Only clients with IP addresses in the `MYSTOPS_METRICS_ALLOWED_IPS`
+    setting are allowed to fetch metrics.
+
+    """
+    if request.META.get("REMOTE_ADDR") not in settings.MYSTOPS_METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    content, content_type = get_metrics()
+    return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,83 @@
+from typing import Dict, List
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponseBadRequest
+from djangokit.core import handler
+
+from ....http import JsonResponse, data_versioned
+from ....models import Route, StopRoute
+from ....stop_metadata import stops as stop_metadata
+
+# Server side cache (responses are keyed on the network data version, so
+# this can be long) & client side cache times
+CACHE_TIME = 30 if settings.DEBUG else (7 * 24 * 60 * 60)
+CLIENT_CACHE_TIME = 30 if settings.DEBUG else (6 * 60 * 60)
+
+
+@handler("get", cache_time=CACHE_TIME)
+@data_versioned(CLIENT_CACHE_TIME)
+def get(request: HttpRequest, id):
+    """Return route with its stops in order and its line geometry.
+
+    Each direction of the route is returned separately. Pass
+    `direction=inbound` or `direction=outbound` to get just one
+    direction.
+
+    """
+    routes = Route.objects.filter(route_id=id).order_by("direction")
+    direction = request.GET.get("direction")
+    if direction:
+        if direction not in ("inbound", "outbound"):
+            return HttpResponseBadRequest(f"Bad direction: {direction}")
+        routes = routes.filter(direction=direction)
+    routes = tuple(routes)
+    if not routes:
+        raise Http404(f"Route not found: {id}")
+
+    stop_routes = (
+        StopRoute.objects.filter(route__in=routes)
+        .order_by("route_id", "sequence")
+        .values_list("route_id", "stop__stop_id")
+    )
+    route_stop_ids: Dict[int, List[int]] = {route.pk: [] for route in routes}
+    for route_pk, stop_id in stop_routes:
+        route_stop_ids[route_pk].append(stop_id)
+
+    first = routes[0]
+    return JsonResponse(
+        {
+            "route": {
+                "id": first.route_id,
+                "type": first.type,
+                "name": first.name,
+                "short_name": first.short_name,
+                "directions": [
+                    {
+                        "direction": route.direction,
+                        "description": route.description,
+                        "stops": get_stops(route_stop_ids[route.pk]),
+                        "geometry": (
+                            {"type": "LineString", "coordinates": route.geometry.coords}
+                            if route.geometry
+                            else None
+                        ),
+                    }
+                    for route in routes
+                ],
+            }
+        }
+    )
+
+
+def get_stops(stop_ids):
+    found = stop_metadata.get_many(stop_ids)
+    return [
+        {
+            "id": stop_id,
+            "name": found[stop_id]["name"],
+            "direction": found[stop_id]["direction"],
+            "location": found[stop_id]["location"],
+        }
+        for stop_id in stop_ids
+        if stop_id in found
+    ]
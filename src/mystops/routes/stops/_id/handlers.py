@@ -1,23 +1,17 @@
 from django.conf import settings
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
-from django.views.decorators.cache import cache_page
+from django.http import Http404
 
-from ....models import Stop
+from ....http import JsonResponse, data_versioned
+from ....stop_metadata import stops
 
 CACHE_TIME = 30 if settings.DEBUG else (6 * 60 * 60)
 
 
-@cache_page(CACHE_TIME)
+# NOTE: Stop metadata is cached in process, so there's no need to cache
+#       responses server side; they're only cached by clients.
+@data_versioned(CACHE_TIME)
 def get(_request, id):
-    stop = get_object_or_404(Stop, stop_id=id)
-    return JsonResponse(
-        {
-            "stop": {
-                "id": stop.stop_id,
-                "name": stop.name,
-                "direction": stop.direction,
-                "location": (stop.location.x, stop.location.y),
-            }
-        }
-    )
+    stop = stops.get(id)
+    if stop is None:
+        raise Http404(f"Stop not found: {id}")
+    return JsonResponse({"stop": stop})
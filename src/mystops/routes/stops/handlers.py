@@ -1,20 +1,71 @@
+import psycopg
 from django.conf import settings
 from django.db import connection
 from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest
 from djangokit.core import handler
 
+from ...http import JsonResponse, data_versioned
+from ...metrics import track_db_time
 from ...models import Stop
+from ...profiling import span
+from ...stop_metadata import stops as stop_metadata
 
-CACHE_TIME = 30 if settings.DEBUG else (6 * 60 * 60)
+# NOTE: Server side cache keys include the network data version (see
+#       mystops.version), so cached responses are replaced as soon as
+#       new data is loaded. Clients can't tell when that happens unless
+#       they request versioned URLs (see mystops.http.data_versioned),
+#       so they cache responses for less time.
+CACHE_TIME = 30 if settings.DEBUG else (7 * 24 * 60 * 60)
+CLIENT_CACHE_TIME = 30 if settings.DEBUG else (6 * 60 * 60)
+
+# Max number of stops that can be requested at once via ``ids``
+MAX_BATCH_SIZE = 500
+
+
+def get_variant(request: HttpRequest) -> str:
+    """Get representation to return based on the ``Accept`` header."""
+    if request.accepts("application/geo+json"):
+        return "geojson"
+    return "json"
 
 
 @handler("get", cache_time=CACHE_TIME)
+@data_versioned(CLIENT_CACHE_TIME, variant=get_variant, vary_on=["Accept"])
 def get(request: HttpRequest):
-    if request.accepts("application/geo+json"):
+    if "ids" in request.GET:
+        return get_batch(request)
+    if get_variant(request) == "geojson":
         return get_geojson(request)
     return get_json(request)
 
 
+def get_batch(request: HttpRequest):
+    """Return stops with the IDs in the ``ids`` query parameter.
+
+    Stops are returned in the order requested. IDs of stops that don't
+    exist are returned in ``not_found``.
+
+    """
+    ids = request.GET["ids"]
+    try:
+        stop_ids = tuple(dict.fromkeys(int(id) for id in ids.split(",")))
+    except ValueError:
+        return HttpResponseBadRequest(f"Bad stop IDs: {ids}")
+    if len(stop_ids) > MAX_BATCH_SIZE:
+        return HttpResponseBadRequest(
+            f"Too many stop IDs: {len(stop_ids)} (max: {MAX_BATCH_SIZE})"
+        )
+    found = stop_metadata.get_many(stop_ids)
+    stops = tuple(found[stop_id] for stop_id in stop_ids if stop_id in found)
+    return JsonResponse(
+        {
+            "stops": stops,
+            "count": len(stops),
+            "not_found": [stop_id for stop_id in stop_ids if stop_id not in found],
+        }
+    )
+
+
 def get_json(_request: HttpRequest):
     """Return all stops as JSON."""
     stops = Stop.objects.all()
@@ -29,21 +80,30 @@ def get_json(_request: HttpRequest):
         }
         for stop in stops
     )
-    return {
-        "stops": stops,
-        "count": len(stops),
-    }
+    return JsonResponse(
+        {
+            "stops": stops,
+            "count": len(stops),
+        }
+    )
 
 
+# NOTE: The feature collection is returned as text so that it can be
+#       passed through to the client as-is rather than being parsed by
+#       psycopg and then re-serialized.
+#
+# NOTE: The envelope and limit are bound parameters so that the
+#       statement text is the same for every request, which allows it
+#       to be prepared once per connection. A NULL limit means no limit.
 GEOJSON_STATEMENT = """\
-SELECT row_to_json(feature_collection) AS feature_collection FROM (
+SELECT row_to_json(feature_collection)::text AS feature_collection FROM (
   SELECT
     'FeatureCollection' AS type,
     (SELECT items FROM (
       SELECT 'name' AS type,
       (SELECT p FROM (SELECT 'EPSG:4326' AS name) AS p) AS properties
     ) AS items) AS crs,
-    array_agg(features) AS features FROM (
+    coalesce(json_agg(features), '[]'::json) AS features FROM (
       SELECT
         'Feature' AS type,
         ST_AsGeoJSON(stop.location)::json AS geometry,
@@ -65,10 +125,10 @@ SELECT row_to_json(feature_collection) AS feature_collection FROM (
         route
         ON stop_route.route_id = route.id 
       WHERE
-        stop.location && {envelope}
+        stop.location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
       GROUP BY
         stop.id
-      {limit}
+      LIMIT %s
     ) AS features
 ) AS feature_collection;\
 """
@@ -80,21 +140,31 @@ def get_geojson(request: HttpRequest, *, statement=GEOJSON_STATEMENT):
     if isinstance(envelope, HttpResponse):
         return envelope
     limit = request.GET.get("limit")
-    limit = int(limit) if limit else ""
-    statement = statement.format(envelope=envelope, limit=limit)
-    with connection.cursor() as cursor:
-        cursor.execute(statement)
-        row = cursor.fetchone()
-        if row is None:
-            return {}
-        data = row[0]
-        if data["features"] is None:
-            data["features"] = []
-        return data
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        return HttpResponseBadRequest(f"Bad limit: {limit}")
+    if limit is not None and limit < 0:
+        return HttpResponseBadRequest(f"Bad limit: {limit}")
+    connection.ensure_connection()
+    # NOTE: Django's psycopg cursors bind parameters client side, which
+    #       doesn't allow for server-side prepared statements, so a
+    #       server-side binding cursor is used here instead.
+    with psycopg.Cursor(connection.connection) as cursor:
+        with track_db_time(), span("db: stops geojson"):
+            cursor.execute(statement, (*envelope, limit), prepare=True)
+            row = cursor.fetchone()
+        # NOTE: The query is an aggregate, so it always returns a row.
+        assert row is not None
+        return HttpResponse(row[0], content_type="application/json")
 
 
 def get_envelope(request: HttpRequest):
-    """Get envelope for bounding box query parameter ``bbox``."""
+    """Get envelope for bounding box query parameter ``bbox``.
+
+    The envelope is returned as a tuple of (minx, miny, maxx, maxy).
+
+    """
     bbox = request.GET.get("bbox")
     if not bbox:
         return HttpResponseBadRequest("bbox query parameter is required")
@@ -108,5 +178,4 @@ def get_envelope(request: HttpRequest):
     minx, miny, maxx, maxy = coords
     if abs(minx) > 180 or abs(miny) > 90 or abs(maxx) > 180 or abs(maxy) > 90:
         return HttpResponseBadRequest(f"Bad bounding box: {bbox}")
-    envelope = f"ST_MakeEnvelope({','.join(str(c) for c in coords)}, 4326)"
-    return envelope
+    return coords
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, HttpResponseBadRequest
+from djangokit.core import handler
+
+from ....http import JsonResponse, data_versioned
+from ....stop_metadata import stops as stop_metadata
+
+# Results only change when new data is loaded, which changes the cache
+# key, so they're cached server side for a long time
+CACHE_TIME = 30 if settings.DEBUG else (7 * 24 * 60 * 60)
+CLIENT_CACHE_TIME = 30 if settings.DEBUG else (60 * 60)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# NOTE: Both the ILIKE and the % (similarity) conditions can use the
+#       trigram index on stop.name. Stops whose names start with the
+#       query are ranked first, then stops are ranked by similarity.
+SEARCH_STATEMENT = """\
+SELECT
+  stop.stop_id
+FROM
+  stop
+WHERE
+  stop.name ILIKE %(contains)s
+  OR stop.name %% %(q)s
+ORDER BY
+  stop.name ILIKE %(prefix)s DESC,
+  similarity(stop.name, %(q)s) DESC,
+  stop.stop_id
+LIMIT %(limit)s;\
+"""
+
+
+@handler("get", cache_time=CACHE_TIME)
+@data_versioned(CLIENT_CACHE_TIME)
+def get(request: HttpRequest):
+    """Search for stops by name.
+
+    Returns up to `limit` stops (default 10, max 50) ranked by how well
+    their names match `q`. If `q` is a stop ID, that stop is returned
+    first.
+
+    """
+    q = " ".join(request.GET.get("q", "").split())
+    if not q:
+        return HttpResponseBadRequest("q query parameter is required")
+
+    limit = request.GET.get("limit")
+    try:
+        limit = int(limit) if limit else DEFAULT_LIMIT
+    except ValueError:
+        return HttpResponseBadRequest(f"Bad limit: {limit}")
+    if not 0 < limit <= MAX_LIMIT:
+        return HttpResponseBadRequest(f"Bad limit: {limit} (max: {MAX_LIMIT})")
+
+    stop_ids = []
+    if q.isdigit() and stop_metadata.get(int(q)):
+        stop_ids.append(int(q))
+
+    pattern = escape_like(q)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_STATEMENT,
+            {
+                "q": q,
+                "contains": f"%{pattern}%",
+                "prefix": f"{pattern}%",
+                "limit": limit,
+            },
+        )
+        stop_ids.extend(row[0] for row in cursor.fetchall())
+
+    unique_stop_ids = tuple(dict.fromkeys(stop_ids))[:limit]
+    found = stop_metadata.get_many(unique_stop_ids)
+    stops = tuple(found[stop_id] for stop_id in unique_stop_ids if stop_id in found)
+    return JsonResponse({"stops": stops, "count": len(stops)})
+
+
+def escape_like(value):
+    """Escape LIKE wildcards in `value`."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
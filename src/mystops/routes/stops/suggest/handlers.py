@@ -0,0 +1,38 @@
+from django.http import HttpRequest, HttpResponseBadRequest
+from django.views.decorators.cache import cache_control
+
+from ....http import JsonResponse
+from ....suggest import suggest_index
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+
+# NOTE: Suggestions are served from memory, so there's no need to cache
+#       responses server side (checking the cache would be slower).
+@cache_control(max_age=60)
+def get(request: HttpRequest):
+    """Suggest stops whose IDs or names start with `q`.
+
+    This is intended for search-as-you-type. For more thorough
+    searching, see `/stops/search`.
+
+    """
+    q = request.GET.get("q", "")
+    limit = request.GET.get("limit")
+    try:
+        limit = int(limit) if limit else DEFAULT_LIMIT
+    except ValueError:
+        return HttpResponseBadRequest(f"Bad limit: {limit}")
+    if not 0 < limit <= MAX_LIMIT:
+        return HttpResponseBadRequest(f"Bad limit: {limit} (max: {MAX_LIMIT})")
+    stops = tuple(
+        {
+            "id": stop["id"],
+            "name": stop["name"],
+            "direction": stop["direction"],
+            "location": stop["location"],
+        }
+        for stop in suggest_index.suggest(q, limit)
+    )
+    return JsonResponse({"stops": stops, "count": len(stops)})
@@ -0,0 +1,69 @@
+"""JSON serializers for API responses.
+
+The serializer used for API responses is selected with the
+`MYSTOPS_JSON_SERIALIZER` setting:
+
+- "orjson" (default): Uses orjson, which natively handles datetimes,
+  tuples, and nested dicts/lists (e.g., GeoJSON from the database) and
+  is much faster than the standard library encoder on large payloads.
+
+- "django": Uses DjangoKit's encoder (the standard library encoder with
+  Django's extensions); this is what handlers that return plain dicts
+  use.
+
+Both serializers return bytes.
+
+"""
+from time import perf_counter
+from typing import Any, Callable, Dict
+
+import orjson
+from django.conf import settings
+from djangokit.core.serializers import JsonEncoder
+from djangokit.core.serializers import dump_json as djangokit_dump_json
+
+from .metrics import SERIALIZATION_DURATION
+from .profiling import span
+
+Serializer = Callable[[Any], bytes]
+
+_fallback_encoder = JsonEncoder()
+
+
+def orjson_default(obj):
+    """Handle types orjson doesn't know about (models, decimals, etc)."""
+    return _fallback_encoder.default(obj)
+
+
+def dump_json_with_orjson(data) -> bytes:
+    return orjson.dumps(data, default=orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dump_json_with_django(data) -> bytes:
+    return djangokit_dump_json(data).encode("utf-8")
+
+
+SERIALIZERS: Dict[str, Serializer] = {
+    "orjson": dump_json_with_orjson,
+    "django": dump_json_with_django,
+}
+
+
+def get_serializer(name=None) -> Serializer:
+    """Get serializer by name, defaulting to the configured serializer."""
+    name = name or settings.MYSTOPS_JSON_SERIALIZER
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON serializer: {name}") from None
+
+
+def dump_json(data) -> bytes:
+    """Serialize `data` to JSON using the configured serializer."""
+    name = settings.MYSTOPS_JSON_SERIALIZER
+    serializer = get_serializer(name)
+    start = perf_counter()
+    with span(f"serialize: {name}"):
+        content = serializer(data)
+    SERIALIZATION_DURATION.labels(name).observe(perf_counter() - start)
+    return content
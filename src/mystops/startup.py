@@ -0,0 +1,58 @@
+"""Process startup hooks."""
+import logging
+
+from django.core.cache import cache
+from django.db import connections
+
+from .db.backends.postgis.base import close_pools
+from .metrics import mark_process_dead
+from .registry import stop_ids
+from .stop_metadata import stops
+from .suggest import suggest_index
+
+log = logging.getLogger(__name__)
+
+
+def warm():
+    """Load per-process caches.
+
+    This is intended to be called from the WSGI module so that caches
+    are loaded once in the uWSGI master process and then shared with
+    workers when they're forked.
+
+    Connections (and connection pools) opened while loading are closed
+    afterwards since they can't be shared across forked processes.
+
+    If loading fails (e.g., because the database or cache is down), the
+    error is logged and startup continues; caches that weren't loaded
+    are loaded lazily on first use instead.
+
+    """
+    try:
+        stop_ids.load()
+        stops.load()
+        suggest_index.load()
+    except Exception:
+        log.exception("Could not warm caches; they'll be loaded on first use")
+    finally:
+        connections.close_all()
+        close_pools()
+        cache.close()
+
+
+def register_exit_hook():
+    """Register cleanup to run when a uWSGI worker exits.
+
+    Workers are recycled regularly (e.g., via `reload-on-rss`), so the
+    metrics for exited workers need to be cleaned up (see
+    :func:`mystops.metrics.mark_process_dead`). The hook is inherited by
+    workers when they're forked from the master process.
+
+    When not running under uWSGI, this does nothing.
+
+    """
+    try:
+        import uwsgi
+    except ImportError:
+        return
+    uwsgi.atexit = mark_process_dead
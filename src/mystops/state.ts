@@ -16,6 +16,10 @@ export interface Result {
   count: number;
   updateTime: string;
   stops: Stop[];
+  // How long ago arrivals were fetched from TriMet, in seconds
+  age?: number;
+  // Set when TriMet is unavailable and previous arrivals are returned
+  stale?: boolean;
 }
 
 export interface Stop {
@@ -34,14 +38,17 @@ export interface Route {
 export interface Arrival {
   estimated: string | Date | null;
   scheduled: string | Date | null;
+  // With absolute times, this is the raw TriMet status (estimated,
+  // scheduled, delayed, or canceled), which is formatted client side.
   status: string | null;
+  reason?: string | null;
   distanceAway: {
     feet: number;
     miles: number;
     meters: number;
     kilometers: number;
   };
-  designation: string | null;
+  designation?: string | null;
 }
 
 export interface Error {
@@ -0,0 +1,108 @@
+"""In-process cache of stop metadata.
+
+This holds the metadata for every stop in the network, keyed by stop ID,
+so that stop details can be looked up without querying the database:
+
+- `id`: TriMet stop ID
+- `name`
+- `direction`
+- `location`: (longitude, latitude)
+- `routes`: Routes that serve the stop, each with `id`, `direction`,
+  `type`, and `short_name`
+
+All stops and their routes are loaded in a single query on first use and
+reloaded when the network data version changes (see
+:mod:`mystops.version`).
+
+"""
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection
+
+from .version import get_data_version
+
+STATEMENT = """\
+SELECT
+  stop.stop_id,
+  stop.name,
+  stop.direction,
+  ST_X(stop.location),
+  ST_Y(stop.location),
+  json_agg(
+    json_build_object(
+      'id', route.route_id,
+      'direction', route.direction,
+      'type', route.type,
+      'short_name', route.short_name
+    )
+    ORDER BY route.route_id, route.direction
+  ) FILTER (WHERE route.id IS NOT NULL)
+FROM
+  stop
+LEFT JOIN
+  stop_route
+  ON stop_route.stop_id = stop.id
+LEFT JOIN
+  route
+  ON stop_route.route_id = route.id
+GROUP BY
+  stop.id\
+"""
+
+
+class StopMetadataCache:
+    def __init__(self):
+        self._lock = Lock()
+        self._stops: Dict[int, dict] = {}
+        self._version: Optional[int] = None
+
+    def load(self):
+        """Load metadata for all stops from database."""
+        # NOTE: The version is read *before* querying so that a load
+        #       that happens in the meantime will trigger a reload.
+        version = get_data_version()
+        with connection.cursor() as cursor:
+            cursor.execute(STATEMENT)
+            rows = cursor.fetchall()
+        self._stops = {
+            stop_id: {
+                "id": stop_id,
+                "name": name,
+                "direction": direction,
+                "location": (x, y),
+                "routes": routes or [],
+            }
+            for stop_id, name, direction, x, y, routes in rows
+        }
+        self._version = version
+
+    def refresh(self):
+        """Reload metadata if the data version has changed."""
+        if self._version != get_data_version():
+            with self._lock:
+                if self._version != get_data_version():
+                    self.load()
+
+    def get(self, stop_id: int) -> Optional[dict]:
+        """Get metadata for stop or `None` if the stop doesn't exist."""
+        self.refresh()
+        return self._stops.get(stop_id)
+
+    def get_many(self, stop_ids: Iterable[int]) -> Dict[int, dict]:
+        """Get metadata for stops that exist, keyed by stop ID."""
+        self.refresh()
+        stops = self._stops
+        return {stop_id: stops[stop_id] for stop_id in stop_ids if stop_id in stops}
+
+    def all(self) -> List[dict]:
+        """Get metadata for all stops."""
+        self.refresh()
+        return list(self._stops.values())
+
+    def __len__(self):
+        self.refresh()
+        return len(self._stops)
+
+
+stops = StopMetadataCache()
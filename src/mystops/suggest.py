@@ -0,0 +1,124 @@
+"""In-process prefix index for stop name suggestions.
+
+This is used to suggest stops as the user types without querying the
+database. Each stop is indexed by its ID and by every word-boundary
+suffix of its name, so "burn" matches "W Burnside & 5th" as well as
+"Burnside Bridge". Keys are kept in sorted lists, so finding the
+matches for a prefix is a binary search followed by a short scan.
+
+The index is built from :mod:`mystops.stop_metadata` on first use and
+rebuilt when the network data version changes (see
+:mod:`mystops.version`).
+
+"""
+import re
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .stop_metadata import stops as stop_metadata
+from .version import get_data_version
+
+# Max number of matching keys to consider for a prefix in each group
+# (see below). This keeps very short prefixes (e.g., "s") fast.
+MAX_SCAN = 1000
+
+# Sorted keys along with the ID of the stop each key belongs to
+Keys = Tuple[List[str], List[int]]
+
+
+def normalize(value: str) -> List[str]:
+    """Split `value` into lower case words."""
+    return re.findall(r"[a-z0-9]+", value.lower())
+
+
+def make_keys(entries: List[Tuple[str, int]]) -> Keys:
+    entries.sort()
+    return [key for key, _ in entries], [stop_id for _, stop_id in entries]
+
+
+def scan(keys: Keys, prefix: str) -> List[int]:
+    """Get IDs of stops with keys that start with `prefix`, in key order."""
+    names, stop_ids = keys
+    start = bisect_left(names, prefix)
+    end = min(start + MAX_SCAN, len(names))
+    matches: Dict[int, None] = {}
+    for i in range(start, end):
+        if not names[i].startswith(prefix):
+            break
+        matches[stop_ids[i]] = None
+    return list(matches)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = Lock()
+        # (start keys, word keys, stops by ID), where start keys are
+        # stop IDs and full names and word keys are the suffixes of
+        # names starting at the second word
+        self._index: Tuple[Keys, Keys, Dict[int, dict]] = (([], []), ([], []), {})
+        self._version: Optional[int] = None
+
+    def load(self):
+        """Build index from stop metadata."""
+        # NOTE: The version is read *before* loading so that a load that
+        #       happens in the meantime will trigger a rebuild.
+        version = get_data_version()
+        stops = stop_metadata.all()
+        start_entries: List[Tuple[str, int]] = []
+        word_entries: List[Tuple[str, int]] = []
+        for stop in stops:
+            stop_id = stop["id"]
+            start_entries.append((str(stop_id), stop_id))
+            words = normalize(stop["name"])
+            if words:
+                start_entries.append((" ".join(words), stop_id))
+            for i in range(1, len(words)):
+                word_entries.append((" ".join(words[i:]), stop_id))
+        # NOTE: The whole index is swapped in at once so that readers
+        #       never see parts of different indexes.
+        self._index = (
+            make_keys(start_entries),
+            make_keys(word_entries),
+            {stop["id"]: stop for stop in stops},
+        )
+        self._version = version
+
+    def refresh(self):
+        """Rebuild index if the data version has changed."""
+        if self._version != get_data_version():
+            with self._lock:
+                if self._version != get_data_version():
+                    self.load()
+
+    def suggest(self, q: str, limit=10) -> List[dict]:
+        """Get up to `limit` stops matching `q`.
+
+        If `q` is a stop ID, that stop is returned first. Stops whose
+        IDs or names start with `q` are returned next, followed by stops
+        with a word in their names that starts with `q`. Within each
+        group, stops are ordered by name.
+
+        """
+        self.refresh()
+        prefix = " ".join(normalize(q))
+        if not prefix:
+            return []
+        start_keys, word_keys, stops = self._index
+        exact_id = int(prefix) if prefix.isdigit() else None
+        ranked = sorted(
+            scan(start_keys, prefix),
+            key=lambda stop_id: (stop_id != exact_id, stops[stop_id]["name"], stop_id),
+        )
+        # NOTE: Word matches are only looked at when there aren't enough
+        #       matches on IDs and the start of names, since they always
+        #       come after those.
+        if len(ranked) < limit:
+            seen = set(ranked)
+            word_matches = [i for i in scan(word_keys, prefix) if i not in seen]
+            word_matches.sort(key=lambda stop_id: (stops[stop_id]["name"], stop_id))
+            ranked.extend(word_matches)
+        return [stops[stop_id] for stop_id in ranked[:limit]]
+
+
+suggest_index = SuggestIndex()
@@ -1,3 +1,12 @@
-from .arrivals import get_arrivals  # noqa: F401
-from .exc import TriMetAPIError, TriMetAPIStopIDNotFoundError  # noqa: F401
+from .arrivals import (  # noqa: F401
+    get_arrivals,
+    get_arrivals_result_set,
+    process_arrivals,
+)
+from .exc import (  # noqa: F401
+    TriMetAPIError,
+    TriMetAPIRateLimitedError,
+    TriMetAPIStopIDNotFoundError,
+    TriMetAPIUnavailableError,
+)
 from .stops import get_stops  # noqa: F401
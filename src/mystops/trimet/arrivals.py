@@ -1,6 +1,8 @@
 import re
 import sys
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
 import zoneinfo
@@ -19,6 +21,10 @@ def get_arrivals(
     # If specified, only arrivals corresponding to these route IDs
     # will be included
     route_ids=(),
+    # If set, arrival statuses will be formatted relative to now (e.g.,
+    # "3 minutes (late)") and arrivals will be given a designation
+    # based on how soon they are; otherwise, see below
+    relative_times=True,
 ):
     """Get arrivals corresponding to stop IDs.
 
@@ -61,9 +67,31 @@ def get_arrivals(
     Stops will be sorted by stop ID, routes will be sorted by name, and
     arrivals will be sorted by time.
 
+    When `relative_times` is *not* set, the result doesn't depend on the
+    current time, so it can be cached and shared until TriMet's data
+    changes. In this case, arrivals have the following structure, and
+    formatting the status relative to now is left to the client::
+
+        {
+            estimated: estimated arrival time,
+            scheduled: scheduled arrival time,
+            status: "estimated", "scheduled", "delayed", or "canceled",
+            reason: reason for delay or cancellation,
+            distanceAway: {...}
+        }
+
     """
-    current_now = now()
+    root = get_arrivals_result_set(api_key, stop_ids)
+    return process_arrivals(root, route_ids, relative_times)
+
+
+def get_arrivals_result_set(api_key, stop_ids) -> dict:
+    """Get raw arrivals result set from TriMet API.
 
+    This is the first half of :func:`get_arrivals`; pass the result to
+    :func:`process_arrivals` to do the second half.
+
+    """
     params = {
         "locIDs": ",".join(str(id) for id in stop_ids),
     }
@@ -79,12 +107,37 @@ def get_arrivals(
             raise exc.TriMetAPIStopIDNotFoundError(stop_id)
         raise exc.TriMetAPIError(error)
 
+    return root
+
+
+def process_arrivals(root, route_ids=(), relative_times=True, now_ms=None):
+    """Process TriMet arrivals result set.
+
+    See :func:`get_arrivals` for details.
+
+    .. note:: TriMet timestamps are converted to datetimes only when
+        they're included in the result, and each distinct timestamp is
+        only converted once. Everything else, e.g. figuring out how far
+        away an arrival is, is done with integer milliseconds.
+
+    """
+    if now_ms is None:
+        now_ms = current_timestamp()
+
+    to_datetime = lru_cache(maxsize=None)(trimet_timestamp_to_datetime)
+
     arrivals = root.get("arrival") or []
     locations = root.get("location") or []
 
+    # NOTE: Arrivals are filtered up front so that no work is done for
+    #       arrivals that won't be included.
+    if route_ids:
+        route_ids = set(route_ids)
+        arrivals = [arrival for arrival in arrivals if arrival["route"] in route_ids]
+
     result = {
         "count": len(arrivals),
-        "updateTime": nice_time(root["queryTime"], True),
+        "updateTime": nice_time(root["queryTime"], True, to_datetime),
         "stops": [
             {
                 "id": location["id"],
@@ -96,26 +149,26 @@ def get_arrivals(
         ],
     }
 
+    stops = {stop["id"]: stop for stop in result["stops"]}
+
     for arrival in arrivals:
         route_id = arrival["route"]
 
-        if route_ids and route_id not in route_ids:
-            continue
-
-        status = get_status_for_result(arrival)
+        if relative_times:
+            status = get_status_for_result(arrival, now_ms, to_datetime)
+        else:
+            status = get_raw_status_for_result(arrival)
 
         if not status:
             # XXX: Just ignore this arrival???
             result["count"] -= 1
             continue
 
-        stops = result["stops"]
-        stop_id = arrival["locid"]
-        stop = next((s for s in stops if s["id"] == stop_id), None)
+        stop = stops[arrival["locid"]]
         sign_text = re.sub(r"\s+", " ", arrival["fullSign"])
-        estimated = arrival.get("estimated")  # timestamp
-        estimated = trimet_timestamp_to_datetime(estimated) if estimated else None
-        scheduled = trimet_timestamp_to_datetime(arrival["scheduled"])
+        estimated_ms = arrival.get("estimated")  # timestamp
+        estimated = to_datetime(estimated_ms) if estimated_ms else None
+        scheduled = to_datetime(arrival["scheduled"])
         feet_away = arrival.get("feet") or 0
         miles_away = feet_away / 5280.0
         meters_away = feet_away * FEET_TO_METERS
@@ -133,9 +186,20 @@ def get_arrivals(
             route = {"id": route_id, "name": sign_text, "arrivals": []}
             stop["routes"].append(route)
 
-        if estimated:
-            delta = estimated - current_now
-            delta_seconds = delta.seconds
+        if not relative_times:
+            route["arrivals"].append(
+                {
+                    "estimated": estimated,
+                    "scheduled": scheduled,
+                    "status": status,
+                    "reason": arrival.get("reason") or None,
+                    "distanceAway": distance_away,
+                }
+            )
+            continue
+
+        if estimated_ms:
+            delta_seconds = seconds_until(estimated_ms, now_ms)
             if delta_seconds <= 60:
                 designation = "red"
             elif delta_seconds <= 180:
@@ -172,6 +236,22 @@ def now() -> datetime:
     return datetime.now(tz=LOCAL_TZ)
 
 
+def current_timestamp() -> int:
+    """Return now as a TriMet timestamp (milliseconds)."""
+    return time.time_ns() // 1_000_000
+
+
+def seconds_until(trimet_timestamp, now_ms) -> int:
+    """Get seconds from `now_ms` until TriMet timestamp.
+
+    .. note:: To match the behavior of `timedelta.seconds`, which this
+        replaces, the result is always positive; i.e., times in the past
+        wrap around to the previous day.
+
+    """
+    return ((trimet_timestamp - now_ms) // 1000) % 86400
+
+
 def trimet_timestamp_to_datetime(timestamp) -> Optional[datetime]:
     """Convert TriMet timestamp to datetime.
 
@@ -186,9 +266,9 @@ def trimet_timestamp_to_datetime(timestamp) -> Optional[datetime]:
     return result
 
 
-def get_status_for_result(result):
+def get_raw_status_for_result(result):
+    """Get TriMet status for result, guessing it if necessary."""
     status = result["status"]
-    reason = result.get("reason")
     estimated = result.get("estimated")
     scheduled = result.get("scheduled")
     stop_id = result["locid"]
@@ -212,13 +292,26 @@ def get_status_for_result(result):
             )
             return None
 
+    return status
+
+
+def get_status_for_result(result, now_ms=None, to_datetime=None):
+    if now_ms is None:
+        now_ms = current_timestamp()
+    status = get_raw_status_for_result(result)
+    reason = result.get("reason")
+    estimated = result.get("estimated")
+    scheduled = result.get("scheduled")
+
+    if status is None:
+        return None
+
     if status == "estimated":
-        timestamp = trimet_timestamp_to_datetime(estimated)
-        delta = timestamp - now()
+        delta_seconds = seconds_until(estimated, now_ms)
         # XXX: If the estimated arrival time is more than hour away,
         #      fall through and show the scheduled time instead.
-        if delta.seconds < 3600:
-            value = nice_delta(estimated)
+        if delta_seconds < 3600:
+            value = nice_delta(estimated, now_ms=now_ms)
             if scheduled:
                 # XXX: This holds TriMet to a slightly higher standard than
                 #      they hold themselves. They consider an arrival on
@@ -233,9 +326,9 @@ def get_status_for_result(result):
                         # Estimated arrival time is before scheduled
                         value = f"{value} (early)"
             return value
-        return f"Scheduled: {nice_time(scheduled)}"
+        return f"Scheduled: {nice_time(scheduled, to_datetime=to_datetime)}"
     if status == "scheduled":
-        return f"Scheduled: {nice_time(scheduled)}"
+        return f"Scheduled: {nice_time(scheduled, to_datetime=to_datetime)}"
     if status == "delayed":
         return f"Delayed: {reason}" if reason else "Delayed"
     if status == "canceled":
@@ -243,9 +336,10 @@ def get_status_for_result(result):
     return "N/A"
 
 
-def nice_delta(trimet_timestamp, with_seconds=False):
-    timestamp = trimet_timestamp_to_datetime(trimet_timestamp)
-    delta_seconds = (timestamp - now()).seconds
+def nice_delta(trimet_timestamp, with_seconds=False, now_ms=None):
+    if now_ms is None:
+        now_ms = current_timestamp()
+    delta_seconds = seconds_until(trimet_timestamp, now_ms)
 
     if delta_seconds <= 30:
         return "Due"
@@ -280,8 +374,9 @@ def nice_delta(trimet_timestamp, with_seconds=False):
     return ", ".join(parts)
 
 
-def nice_time(trimet_timestamp, with_seconds=False):
-    timestamp = trimet_timestamp_to_datetime(trimet_timestamp)
+def nice_time(trimet_timestamp, with_seconds=False, to_datetime=None):
+    to_datetime = to_datetime or trimet_timestamp_to_datetime
+    timestamp = to_datetime(trimet_timestamp)
     hours = timestamp.hour
     am_pm = "a.m." if hours < 12 else "p.m."
     minutes = timestamp.minute
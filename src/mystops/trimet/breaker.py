@@ -0,0 +1,81 @@
+import time
+from threading import Lock
+from typing import Dict
+
+from .exc import TriMetAPIUnavailableError
+
+
+class CircuitBreaker:
+    """Stop calling a failing service for a while.
+
+    The breaker starts out *closed*, and calls are allowed through. After
+    `failure_threshold` consecutive failures, it *opens*, and calls fail
+    immediately with :class:`TriMetAPIUnavailableError` instead of
+    waiting on a service that's down.
+
+    After `reset_timeout` seconds, the breaker goes *half-open* and lets
+    a single trial call through. If the trial call succeeds, the breaker
+    closes again; if it fails, the breaker re-opens for another
+    `reset_timeout` seconds.
+
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+    def check(self):
+        """Check whether a call is allowed.
+
+        Raises:
+            TriMetAPIUnavailableError: When the breaker is open or when
+                it's half-open and a trial call is already in progress
+
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # NOTE: Resetting the open time means only one trial call
+                #       is let through per reset period, including when a
+                #       previous trial call never reported back.
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+            raise TriMetAPIUnavailableError(self.name)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(service) -> CircuitBreaker:
+    """Get the circuit breaker for TriMet API `service`."""
+    if service not in breakers:
+        breakers.setdefault(service, CircuitBreaker(service))
+    return breakers[service]
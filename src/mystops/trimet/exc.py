@@ -2,6 +2,19 @@ class TriMetAPIError(Exception):
     pass
 
 
+class TriMetAPIUnavailableError(TriMetAPIError):
+    def __init__(self, service, reason="too many recent errors"):
+        super().__init__(
+            f"TriMet API service is temporarily unavailable: {service} ({reason})"
+        )
+        self.service = service
+
+
+class TriMetAPIRateLimitedError(TriMetAPIUnavailableError):
+    def __init__(self, service):
+        super().__init__(service, "request budget used up")
+
+
 class TriMetAPIStopIDNotFoundError(Exception):
     def __init__(self, stop_id):
         super().__init__(stop_id)
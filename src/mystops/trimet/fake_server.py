@@ -0,0 +1,177 @@
+"""Local stand-in for the TriMet API.
+
+This serves recorded TriMet API responses so that the app can be load
+tested without hitting the real API (see the `load-test` command). To
+point the app at it, set the `TRIMET_API_URL` environment variable when
+starting the app, e.g.::
+
+    TRIMET_API_URL=http://localhost:8001/ws djangokit runserver
+
+Fixtures are raw TriMet API responses:
+
+- arrivals: A response from the arrivals service (see the
+  `record-arrivals` command). Arrivals are replayed with their times
+  shifted so that they're relative to now. Stops that aren't in the
+  fixture are given the arrivals of one of the stops that is. If no
+  arrivals fixture is specified, synthetic arrivals are generated for
+  whatever stops are requested (see :mod:`.fake`).
+
+- stops: A response from the stops service (`raw_stops.json` in the
+  TriMet data directory), which is replayed as-is.
+
+Latency and errors can be injected to see how the app behaves when the
+API is slow or flaky.
+
+"""
+import json
+import random
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+from .fake import generate_arrivals
+
+# Keys of timestamps in arrivals that are shifted when replaying
+TIMESTAMP_KEYS = ("estimated", "scheduled")
+
+
+class FakeTriMetServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        arrivals_fixture=None,
+        stops_fixture=None,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        seed=None,
+    ):
+        super().__init__(address, RequestHandler)
+        if arrivals_fixture:
+            with Path(arrivals_fixture).open() as fp:
+                self.arrivals = json.load(fp)["resultSet"]
+        else:
+            self.arrivals = None
+        if stops_fixture:
+            with Path(stops_fixture).open() as fp:
+                self.stops = fp.read().encode("utf-8")
+        else:
+            self.stops = None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.counts = Counter()
+        self.lock = Lock()
+
+        if self.arrivals is not None:
+            root = self.arrivals
+            locations = {location["id"]: location for location in root["location"]}
+            arrivals = {stop_id: [] for stop_id in locations}
+            for arrival in root.get("arrival") or ():
+                arrivals[arrival["locid"]].append(arrival)
+            self.fixture_stop_ids = sorted(locations)
+            self.fixture_locations = locations
+            self.fixture_arrivals = arrivals
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/ws"
+
+    def start(self) -> Thread:
+        """Start serving in a background thread."""
+        thread = Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def get_delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        return max(0, self.latency + jitter)
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def make_arrivals(self, stop_ids) -> dict:
+        """Make arrivals response for stops from fixture."""
+        now_ms = time.time_ns() // 1_000_000
+        if self.arrivals is None:
+            root = generate_arrivals(stop_ids, seed=self.seed or 0, now_ms=now_ms)
+            return {"resultSet": root}
+        shift = now_ms - self.arrivals["queryTime"]
+        fixture_stop_ids = self.fixture_stop_ids
+        locations = []
+        arrivals = []
+        for stop_id in stop_ids:
+            fixture_stop_id = fixture_stop_ids[stop_id % len(fixture_stop_ids)]
+            location = self.fixture_locations[fixture_stop_id]
+            locations.append({**location, "id": stop_id})
+            for arrival in self.fixture_arrivals[fixture_stop_id]:
+                arrival = {**arrival, "locid": stop_id}
+                for key in TIMESTAMP_KEYS:
+                    if arrival.get(key):
+                        arrival[key] += shift
+                arrivals.append(arrival)
+        return {
+            "resultSet": {
+                "queryTime": now_ms,
+                "location": locations,
+                "arrival": arrivals,
+            }
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server: FakeTriMetServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = url.path.rstrip("/").rsplit("/", 1)[-1].lower()
+        params = parse_qs(url.query)
+        server = self.server
+        server.count(service)
+
+        delay = server.get_delay()
+        if delay:
+            time.sleep(delay)
+
+        if server.should_fail():
+            server.count("errors")
+            return self.send(500, b"Fake TriMet API error")
+
+        if service == "arrivals":
+            loc_ids = params.get("locIDs", [""])[0]
+            try:
+                stop_ids = [int(id) for id in loc_ids.split(",")]
+            except ValueError:
+                return self.send(400, b"Bad locIDs")
+            data = server.make_arrivals(stop_ids)
+            return self.send(200, json.dumps(data).encode("utf-8"))
+
+        if service == "stops" and server.stops is not None:
+            return self.send(200, server.stops)
+
+        return self.send(404, b"Not found")
+
+    def send(self, status, body):
+        content_type = "application/json" if status == 200 else "text/plain"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -1,20 +1,47 @@
+import os
+
 import requests
 
+from .breaker import get_breaker
 from .exc import TriMetAPIError
 
-BASE_URL = "http://developer.trimet.org/ws/v{version}/{service}"
+# NOTE: The TRIMET_API_URL environment variable can be used to point at
+#       a stand-in for the TriMet API (see :mod:`.fake_server`).
+API_URL = os.environ.get("TRIMET_API_URL", "http://developer.trimet.org/ws")
+BASE_URL = API_URL.rstrip("/") + "/v{version}/{service}"
+
+# Seconds to wait for the TriMet API to respond
+DEFAULT_TIMEOUT = 5
+
 
+def make_request(service, api_key, params=None, version=1, timeout=DEFAULT_TIMEOUT):
+    """Make request to TriMet API `service`.
 
-def make_request(service, api_key, params=None, version=1):
+    Requests go through a per-service circuit breaker, so when the API is
+    down or responding slowly, requests will fail fast with
+    :class:`TriMetAPIUnavailableError` for a while rather than each one
+    waiting for the timeout.
+
+    """
+    breaker = get_breaker(service)
+    breaker.check()
     url = BASE_URL.format(service=service, version=version)
     default_params = {
         "appID": api_key,
         "json": "true",
     }
-    params = {**default_params, **params}
-    response = requests.get(url, params=params)
+    params = {**default_params, **(params or {})}
+    try:
+        response = requests.get(url, params=params, timeout=timeout)
+    except requests.RequestException as exc:
+        breaker.record_failure()
+        raise TriMetAPIError(
+            f"Error calling TriMet API service: {service} ({exc.__class__.__name__})"
+        ) from exc
     if response.status_code != 200:
+        breaker.record_failure()
         raise TriMetAPIError(
             f"Error calling TriMet API service: {service} ({response.url})"
         )
+    breaker.record_success()
     return response
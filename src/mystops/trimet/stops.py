@@ -43,6 +43,8 @@ def get_stops(api_key, out_dir, overwrite=False):
                 "showRoutes": "true",
                 "showRouteDirs": "true",
             },
+            # NOTE: This is a large download, so allow plenty of time.
+            timeout=120,
         )
         with raw_stops_file.open("w") as fp:
             fp.write(response.text)
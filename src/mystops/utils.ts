@@ -1,3 +1,5 @@
+import { Arrival } from "./state";
+
 /**
  * Split `term` into a list of sorted stop IDs.
  *
@@ -42,3 +44,123 @@ class InvalidStopIdError extends Error {
     this.stopIDs = stopIDs;
   }
 }
+
+const LOCAL_TIME_ZONE = "America/Los_Angeles";
+
+/**
+ * Get display status for an arrival relative to `now`.
+ *
+ * This mirrors the server-side formatting in `get_status_for_result`
+ * so that arrivals can be fetched with absolute times only.
+ *
+ * @param arrival An arrival with absolute times and a raw status
+ * @param now Current time
+ */
+export function arrivalStatus(arrival: Arrival, now: Date): string {
+  const { status, reason } = arrival;
+  const estimated = toDate(arrival.estimated);
+  const scheduled = toDate(arrival.scheduled);
+
+  if (status === "estimated" && estimated) {
+    const seconds = (estimated.getTime() - now.getTime()) / 1000;
+    // XXX: If the estimated arrival time is more than hour away, fall
+    //      through and show the scheduled time instead.
+    if (seconds < 3600) {
+      let value = niceDelta(seconds);
+      // NOTE: This compares milliseconds, like the server does, so
+      //       that arrivals right at the boundary are labeled the same
+      //       either way.
+      if (scheduled) {
+        const deltaMs = estimated.getTime() - scheduled.getTime();
+        if (Math.abs(deltaMs) > 60000) {
+          value = `${value} (${deltaMs > 0 ? "late" : "early"})`;
+        }
+      }
+      return value;
+    }
+    return `Scheduled: ${niceTime(scheduled)}`;
+  }
+  if (status === "estimated" || status === "scheduled") {
+    return `Scheduled: ${niceTime(scheduled)}`;
+  }
+  if (status === "delayed") {
+    return reason ? `Delayed: ${reason}` : "Delayed";
+  }
+  if (status === "canceled") {
+    return reason ? `Canceled: ${reason}` : "Canceled";
+  }
+  return "N/A";
+}
+
+/**
+ * Get designation (color band) for an arrival relative to `now`.
+ *
+ * @param arrival An arrival with absolute times
+ * @param now Current time
+ */
+export function arrivalDesignation(
+  arrival: Arrival,
+  now: Date,
+): string | null {
+  const estimated = toDate(arrival.estimated);
+  if (!estimated) {
+    return null;
+  }
+  const seconds = (estimated.getTime() - now.getTime()) / 1000;
+  if (seconds <= 60) {
+    return "red";
+  }
+  if (seconds <= 180) {
+    return "orange";
+  }
+  if (seconds <= 300) {
+    return "yellow";
+  }
+  return null;
+}
+
+function niceDelta(seconds: number): string {
+  if (seconds <= 30) {
+    return "Due";
+  }
+  if (seconds < 60) {
+    return "Less than a minute";
+  }
+  const hours = Math.floor(seconds / 3600);
+  let minutes = Math.floor((seconds % 3600) / 60);
+  // XXX: Only round the number of minutes up if the number of seconds
+  //      remaining is close to a minute so that riders won't think they
+  //      have more time than they actually do.
+  if (seconds % 60 > 45) {
+    minutes += 1;
+  }
+  const parts: string[] = [];
+  if (hours) {
+    parts.push(`${hours} hour${hours === 1 ? "" : "s"}`);
+  }
+  if (minutes) {
+    parts.push(`${minutes} minute${minutes === 1 ? "" : "s"}`);
+  }
+  return parts.join(", ");
+}
+
+function niceTime(date: Date | null): string {
+  if (!date) {
+    return "N/A";
+  }
+  return date
+    .toLocaleTimeString("en-US", {
+      hour: "numeric",
+      minute: "2-digit",
+      timeZone: LOCAL_TIME_ZONE,
+    })
+    .replace("AM", "a.m.")
+    .replace("PM", "p.m.");
+}
+
+function toDate(value: string | Date | null): Date | null {
+  if (!value) {
+    return null;
+  }
+  return value instanceof Date ? value : new Date(value);
+}
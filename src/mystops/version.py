@@ -0,0 +1,91 @@
+"""Network data version.
+
+The data version is bumped after each network data load (stops, routes,
+and stop routes). Anything derived from the network data, such as
+in-process indexes, can compare the version it was built from against
+the current version to decide whether it needs to be rebuilt.
+
+The current version is stored in the database, which is the source of
+truth, and cached in the shared cache so that workers don't each have
+to query for it. The cached version expires after
+`MYSTOPS_DATA_VERSION_CHECK_INTERVAL` seconds, so a bump is seen within
+that time even if the process that did the load didn't write to the
+same cache. Each process also only checks the version that often so
+that checking it doesn't add a round-trip to every request.
+
+Cache keys for responses derived from the network data include the
+version (see :func:`make_versioned_key`), so after a load, previously
+cached responses are no longer used, and they can be cached for a long
+time.
+
+"""
+import time
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import DataVersion
+
+CACHE_KEY = "mystops:data-version"
+
+_lock = Lock()
+_version = None
+_checked_at = 0.0
+
+
+def get_data_version() -> int:
+    """Get current network data version.
+
+    If the version has never been set, 0 is returned.
+
+    """
+    global _version, _checked_at
+    now = time.monotonic()
+    interval = settings.MYSTOPS_DATA_VERSION_CHECK_INTERVAL
+    if _version is None or now - _checked_at > interval:
+        # NOTE: The version is fetched outside the lock so that other
+        #       threads aren't blocked on I/O. The lock is only held to
+        #       publish the result, which is skipped if a more recent
+        #       check (or bump) has already been published.
+        version = cache.get(CACHE_KEY)
+        if version is None:
+            version = get_stored_data_version()
+            cache.set(CACHE_KEY, version, interval)
+        with _lock:
+            if _version is None or now > _checked_at:
+                _version = version
+                _checked_at = now
+    return _version
+
+
+def get_stored_data_version() -> int:
+    """Get network data version from database."""
+    version = DataVersion.objects.values_list("version", flat=True).first()
+    return version or 0
+
+
+def bump_data_version() -> int:
+    """Bump network data version and return the new version.
+
+    The version is a timestamp in milliseconds so that it's always
+    increasing and doesn't depend on the previous value.
+
+    """
+    global _version, _checked_at
+    version = time.time_ns() // 1_000_000
+    DataVersion.objects.update_or_create(id=1, defaults={"version": version})
+    cache.set(CACHE_KEY, version, settings.MYSTOPS_DATA_VERSION_CHECK_INTERVAL)
+    with _lock:
+        _version = version
+        _checked_at = time.monotonic()
+    return version
+
+
+def make_versioned_key(key, key_prefix, version) -> str:
+    """Make cache key that includes the network data version.
+
+    This can be used as a cache's `KEY_FUNCTION`.
+
+    """
+    return f"{key_prefix}:{version}:{get_data_version()}:{key}"
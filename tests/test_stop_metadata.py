@@ -0,0 +1,54 @@
+import pytest
+from django.contrib.gis.geos import Point
+
+from mystops.models import Route, Stop, StopRoute
+from mystops.stop_metadata import StopMetadataCache
+from mystops.version import get_data_version
+
+
+def make_stops(num_stops, num_routes=3):
+    routes = [
+        Route.objects.create(
+            route_id=route_id,
+            direction="inbound",
+            type="bus",
+            name=f"Route {route_id}",
+            short_name=str(route_id),
+            description="",
+        )
+        for route_id in range(1, num_routes + 1)
+    ]
+    for stop_id in range(1, num_stops + 1):
+        stop = Stop.objects.create(
+            stop_id=stop_id,
+            name=f"Stop {stop_id}",
+            location=Point(-122.6, 45.5),
+        )
+        for route in routes[: stop_id % num_routes + 1]:
+            StopRoute.objects.create(stop=stop, route=route)
+    return list(range(1, num_stops + 1))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_stops", [1, 10, 100])
+def test_get_many_loads_stops_and_routes_in_one_query(
+    num_stops, django_assert_num_queries
+):
+    stop_ids = make_stops(num_stops)
+    cache = StopMetadataCache()
+    # NOTE: The data version may be read from the database on first use,
+    #       which isn't what's being tested here.
+    get_data_version()
+
+    with django_assert_num_queries(1):
+        found = cache.get_many(stop_ids)
+
+    assert sorted(found) == stop_ids
+    for stop_id, stop in found.items():
+        routes = stop["routes"]
+        assert len(routes) == stop_id % 3 + 1
+        assert set(routes[0]) == {"id", "direction", "type", "short_name"}
+
+    # Subsequent lookups are served from memory
+    with django_assert_num_queries(0):
+        cache.get_many(stop_ids)